@@ -1,7 +1,9 @@
 """
 Interview Engine - Core AI logic for conducting interviews
 """
+import asyncio
 import logging
+from functools import partial
 from typing import Dict, List, Optional, AsyncGenerator
 import google.generativeai as genai
 from config import GEMINI_API_KEY, ROLE_TEMPLATES
@@ -165,12 +167,17 @@ Your answer:"""
         try:
             full_prompt = system_prompt + "\n\n" + question_prompt
             
-            response = self.model.generate_content(
-                full_prompt,
-                stream=True,
+            # The Gemini stream blocks on the network: request it and pull each
+            # chunk in a worker thread so the event loop keeps serving others
+            response = await asyncio.to_thread(
+                partial(self.model.generate_content, full_prompt, stream=True)
             )
+            chunks = iter(response)
             
-            for chunk in response:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
                 if chunk.text:
                     yield chunk.text
                     
@@ -4,9 +4,12 @@ Uses SpeechRecognition with fallback to Whisper for high-accuracy transcription.
 """
 import speech_recognition as sr
 import threading
+import multiprocessing
 import queue
 import time
 import re
+import bisect
+from array import array
 from dataclasses import dataclass, field
 from typing import Optional, Callable, List, Dict, Any
 from enum import Enum
@@ -15,6 +18,13 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# WebRTC VAD enables low-latency frame streaming; without it we fall back
+# to SpeechRecognition's whole-phrase listen()
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
 
 class TranscriptType(Enum):
     """Type of transcribed content."""
@@ -65,6 +75,12 @@ class SpeechListener:
         'class', 'object', 'method', 'variable', 'loop', 'condition'
     ]
     
+    # Streaming capture settings (WebRTC VAD accepts 10/20/30 ms frames at 16 kHz)
+    VAD_SAMPLE_RATE = 16000
+    VAD_FRAME_MS = 30
+    VAD_AGGRESSIVENESS = 2
+    MAX_PHRASE_SECONDS = 30.0
+    
     # Question indicators
     QUESTION_PATTERNS = [
         r'\b(can you|could you|would you|please)\s+\w+',
@@ -83,13 +99,22 @@ class SpeechListener:
         r'describe your experience'
     ]
     
-    def __init__(self, device_index: Optional[int] = None):
+    def __init__(self, device_index: Optional[int] = None, capture_process: bool = False):
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone(device_index=device_index)
+        if webrtcvad is not None:
+            self.microphone = sr.Microphone(
+                device_index=device_index,
+                sample_rate=self.VAD_SAMPLE_RATE,
+                chunk_size=self.VAD_SAMPLE_RATE * self.VAD_FRAME_MS // 1000
+            )
+        else:
+            self.microphone = sr.Microphone(device_index=device_index)
         self.device_index = device_index
         
         # Transcript storage
         self._transcripts: List[TranscriptResult] = []
+        self._ts: array = array('d')  # Parallel timestamps, ascending (queue order)
+        self._transcripts_lock = threading.Lock()  # Keeps _transcripts and _ts in step
         self._transcript_queue: queue.Queue = queue.Queue()
         
         # Threading
@@ -98,6 +123,15 @@ class SpeechListener:
         self._process_thread: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
         
+        # Optional capture subprocess (keeps audio capture + VAD off this GIL)
+        if capture_process and webrtcvad is None:
+            logger.warning("capture_process requires webrtcvad; capturing in a thread instead")
+            capture_process = False
+        self.capture_process = capture_process
+        self._capture_proc: Optional[multiprocessing.Process] = None
+        self._capture_queue: Optional[multiprocessing.Queue] = None
+        self._capture_stop: Optional[multiprocessing.Event] = None
+        
         # Callbacks
         self._on_transcript: Optional[Callable[[TranscriptResult], None]] = None
         self._on_coding_question: Optional[Callable[[TranscriptResult], None]] = None
@@ -143,8 +177,20 @@ class SpeechListener:
         self._stop_event.clear()
         self._listening = True
         
-        # Start listening thread
-        self._listen_thread = threading.Thread(target=self._listen_loop, daemon=True)
+        # Start listening thread (or capture process + relay thread)
+        if self.capture_process:
+            self._capture_queue = multiprocessing.Queue()
+            self._capture_stop = multiprocessing.Event()
+            self._capture_proc = multiprocessing.Process(
+                target=_capture_process_main,
+                args=(self.device_index, self.recognizer.pause_threshold,
+                      self.recognizer.phrase_threshold, self._capture_queue, self._capture_stop),
+                daemon=True
+            )
+            self._capture_proc.start()
+            self._listen_thread = threading.Thread(target=self._relay_loop, daemon=True)
+        else:
+            self._listen_thread = threading.Thread(target=self._listen_loop, daemon=True)
         self._listen_thread.start()
         
         # Start processing thread
@@ -159,6 +205,13 @@ class SpeechListener:
         self._stop_event.set()
         self._listening = False
         
+        if self._capture_proc:
+            self._capture_stop.set()
+            self._capture_proc.join(timeout=2.0)
+            if self._capture_proc.is_alive():
+                self._capture_proc.terminate()
+            self._capture_proc = None
+        
         if self._listen_thread:
             self._listen_thread.join(timeout=2.0)
         if self._process_thread:
@@ -168,6 +221,10 @@ class SpeechListener:
     
     def _listen_loop(self):
         """Main listening loop - runs in background thread."""
+        if webrtcvad is not None:
+            self._stream_loop()
+            return
+        
         while not self._stop_event.is_set():
             try:
                 with self.microphone as source:
@@ -176,7 +233,7 @@ class SpeechListener:
                         audio = self.recognizer.listen(
                             source, 
                             timeout=5.0,
-                            phrase_time_limit=30.0
+                            phrase_time_limit=self.MAX_PHRASE_SECONDS
                         )
                         
                         # Queue audio for processing
@@ -195,6 +252,50 @@ class SpeechListener:
                     self._on_error(e)
                 time.sleep(0.5)
     
+    def _stream_loop(self):
+        """
+        Frame-level listening loop using WebRTC VAD.
+        Each utterance is queued as soon as trailing silence is detected,
+        instead of waiting on listen()'s phrase time limit.
+        """
+        while not self._stop_event.is_set():
+            try:
+                with self.microphone as source:
+                    for data in _vad_utterances(source, self._stop_event,
+                                                self.recognizer.pause_threshold,
+                                                self.recognizer.phrase_threshold):
+                        self._transcript_queue.put({
+                            'audio': sr.AudioData(data, source.SAMPLE_RATE, source.SAMPLE_WIDTH),
+                            'timestamp': time.time()
+                        })
+                        
+            except Exception as e:
+                logger.error(f"Listen error: {e}")
+                if self._on_error:
+                    self._on_error(e)
+                time.sleep(0.5)
+    
+    def _relay_loop(self):
+        """Move utterances from the capture process into the transcription queue."""
+        while not self._stop_event.is_set():
+            try:
+                item = self._capture_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            
+            if isinstance(item, str):
+                # Capture process reports errors as strings
+                logger.error(f"Listen error (capture process): {item}")
+                if self._on_error:
+                    self._on_error(RuntimeError(item))
+                continue
+            
+            data, sample_rate, sample_width, timestamp = item
+            self._transcript_queue.put({
+                'audio': sr.AudioData(data, sample_rate, sample_width),
+                'timestamp': timestamp
+            })
+    
     def _process_loop(self):
         """Process transcription queue in background."""
         while not self._stop_event.is_set():
@@ -212,7 +313,9 @@ class SpeechListener:
                 result = self._transcribe(audio, timestamp)
                 
                 if result and result.text.strip():
-                    self._transcripts.append(result)
+                    with self._transcripts_lock:
+                        self._transcripts.append(result)
+                        self._ts.append(result.timestamp)
                     
                     # Trigger callbacks
                     if self._on_transcript:
@@ -246,11 +349,12 @@ class SpeechListener:
         
         duration = time.time() - start_time
         
-        # Analyze transcript
-        transcript_type = self._classify_transcript(text)
-        keywords = self._extract_keywords(text)
+        # Analyze transcript (lowercase once, shared by all helpers)
+        text_lower = text.lower()
+        transcript_type = self._classify_transcript(text, text_lower)
+        keywords = self._extract_keywords(text, text_lower)
         is_question = self._is_question(text)
-        is_coding = self._is_coding_question(text)
+        is_coding = self._is_coding_question(text, text_lower, is_question)
         
         return TranscriptResult(
             text=text,
@@ -263,9 +367,10 @@ class SpeechListener:
             is_coding_question=is_coding
         )
     
-    def _classify_transcript(self, text: str) -> TranscriptType:
+    def _classify_transcript(self, text: str, text_lower: Optional[str] = None) -> TranscriptType:
         """Classify the type of transcript."""
-        text_lower = text.lower()
+        if text_lower is None:
+            text_lower = text.lower()
         
         # Check for behavioral patterns
         for pattern in self.BEHAVIORAL_PATTERNS:
@@ -288,9 +393,10 @@ class SpeechListener:
         
         return TranscriptType.STATEMENT
     
-    def _extract_keywords(self, text: str) -> List[str]:
+    def _extract_keywords(self, text: str, text_lower: Optional[str] = None) -> List[str]:
         """Extract relevant keywords from text."""
-        text_lower = text.lower()
+        if text_lower is None:
+            text_lower = text.lower()
         found = []
         
         for keyword in self.CODING_KEYWORDS:
@@ -306,14 +412,18 @@ class SpeechListener:
                 return True
         return False
     
-    def _is_coding_question(self, text: str) -> bool:
+    def _is_coding_question(self, text: str, text_lower: Optional[str] = None,
+                            is_question: Optional[bool] = None) -> bool:
         """Check if text is specifically a coding question."""
-        text_lower = text.lower()
-        
         # Must be a question
-        if not self._is_question(text):
+        if is_question is None:
+            is_question = self._is_question(text)
+        if not is_question:
             return False
         
+        if text_lower is None:
+            text_lower = text.lower()
+        
         # Must contain coding-related keywords
         coding_indicators = [
             'write', 'implement', 'code', 'function', 'algorithm',
@@ -322,16 +432,22 @@ class SpeechListener:
         
         return any(indicator in text_lower for indicator in coding_indicators)
     
+    def _index_after(self, cutoff: float) -> int:
+        """Index of the first transcript newer than cutoff (binary search; hold _transcripts_lock)."""
+        return bisect.bisect_right(self._ts, cutoff)
+    
     def get_recent_transcripts(self, max_age_seconds: float = 60.0) -> List[TranscriptResult]:
         """Get transcripts from the last N seconds."""
         cutoff = time.time() - max_age_seconds
-        return [t for t in self._transcripts if t.timestamp > cutoff]
+        with self._transcripts_lock:
+            return self._transcripts[self._index_after(cutoff):]
     
     def get_coding_questions(self, max_age_seconds: float = 300.0) -> List[TranscriptResult]:
         """Get detected coding questions."""
         cutoff = time.time() - max_age_seconds
-        return [t for t in self._transcripts 
-                if t.is_coding_question and t.timestamp > cutoff]
+        with self._transcripts_lock:
+            recent = self._transcripts[self._index_after(cutoff):]
+        return [t for t in recent if t.is_coding_question]
     
     def get_latest_transcript(self) -> Optional[TranscriptResult]:
         """Get the most recent transcript."""
@@ -345,7 +461,10 @@ class SpeechListener:
     def clear_old_transcripts(self, max_age_seconds: float = 300.0):
         """Clear transcripts older than specified age."""
         cutoff = time.time() - max_age_seconds
-        self._transcripts = [t for t in self._transcripts if t.timestamp > cutoff]
+        with self._transcripts_lock:
+            idx = self._index_after(cutoff)
+            self._transcripts = self._transcripts[idx:]
+            self._ts = self._ts[idx:]
     
     def get_stats(self) -> Dict[str, Any]:
         """Get listening statistics."""
@@ -362,6 +481,66 @@ class SpeechListener:
         return self._listening
 
 
+def _vad_utterances(source, stop_event, pause_threshold: float, phrase_threshold: float):
+    """
+    Read VAD-sized frames from an open microphone source and yield the raw
+    PCM bytes of each utterance once pause_threshold of silence follows it.
+    """
+    frame_ms = SpeechListener.VAD_FRAME_MS
+    vad = webrtcvad.Vad(SpeechListener.VAD_AGGRESSIVENESS)
+    silence_limit = max(1, int(pause_threshold * 1000 / frame_ms))
+    min_speech_frames = max(1, int(phrase_threshold * 1000 / frame_ms))
+    max_frames = int(SpeechListener.MAX_PHRASE_SECONDS * 1000 / frame_ms)
+    
+    frames: List[bytes] = []
+    speech_frames = 0
+    silent_frames = 0
+    
+    while not stop_event.is_set():
+        frame = source.stream.read(source.CHUNK)
+        
+        if vad.is_speech(frame, source.SAMPLE_RATE):
+            frames.append(frame)
+            speech_frames += 1
+            silent_frames = 0
+        elif frames:
+            frames.append(frame)
+            silent_frames += 1
+        else:
+            continue
+        
+        if silent_frames < silence_limit and len(frames) < max_frames:
+            continue
+        
+        # Utterance finished - drop short blips, emit the rest
+        if speech_frames >= min_speech_frames:
+            yield b"".join(frames)
+        frames = []
+        speech_frames = 0
+        silent_frames = 0
+
+
+def _capture_process_main(device_index: Optional[int], pause_threshold: float,
+                          phrase_threshold: float, out_queue, stop_event):
+    """
+    Capture process entry point. Owns the microphone and pushes picklable
+    (bytes, sample_rate, sample_width, timestamp) tuples to out_queue.
+    """
+    microphone = sr.Microphone(
+        device_index=device_index,
+        sample_rate=SpeechListener.VAD_SAMPLE_RATE,
+        chunk_size=SpeechListener.VAD_SAMPLE_RATE * SpeechListener.VAD_FRAME_MS // 1000
+    )
+    while not stop_event.is_set():
+        try:
+            with microphone as source:
+                for data in _vad_utterances(source, stop_event, pause_threshold, phrase_threshold):
+                    out_queue.put((data, source.SAMPLE_RATE, source.SAMPLE_WIDTH, time.time()))
+        except Exception as e:
+            out_queue.put(str(e))
+            time.sleep(0.5)
+
+
 # Convenience function to list available microphones
 def list_microphones() -> List[Dict[str, Any]]:
     """List all available microphones."""
@@ -376,9 +555,10 @@ def list_microphones() -> List[Dict[str, Any]]:
 
 # Factory function
 def create_speech_listener(device_index: Optional[int] = None, 
-                          calibrate: bool = True) -> SpeechListener:
+                          calibrate: bool = True,
+                          capture_process: bool = False) -> SpeechListener:
     """Create a configured SpeechListener."""
-    listener = SpeechListener(device_index=device_index)
+    listener = SpeechListener(device_index=device_index, capture_process=capture_process)
     if calibrate:
         listener.calibrate()
     return listener
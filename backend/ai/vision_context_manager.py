@@ -19,6 +19,19 @@ class ContextSource(Enum):
     RESUME_DATA = "resume_data"
 
 
+# One bit per source so get_merged_context can track sources in a plain int
+_SOURCE_BITS: Dict[ContextSource, int] = {source: 1 << i for i, source in enumerate(ContextSource)}
+
+# Skill/text tokens: word runs that keep "+"/"#" and inner "."/"/"/"-"
+# ("c++", "c#", "node.js", "ci/cd"), so skills and text split the same way
+_SKILL_TOKEN_RE = re.compile(r'[\w+#]+(?:[./-][\w+#]+)*')
+
+
+def _skill_tokens(text: str) -> tuple:
+    """Lowercased skill tokens of text, in order."""
+    return tuple(_SKILL_TOKEN_RE.findall(text.lower()))
+
+
 class ContextPriority(Enum):
     """Priority levels for context resolution."""
     CRITICAL = 5      # Screen content (highest - visual truth)
@@ -82,6 +95,8 @@ class VisionContextManager:
         self._audio_buffer: deque = deque(maxlen=50)
         self._conversation_buffer: deque = deque(maxlen=30)
         self._static_context: Dict[str, ContextItem] = {}
+        self._skill_set: frozenset = frozenset()  # Token tuples, one per skill
+        self._skill_lengths: frozenset = frozenset()  # Distinct tuple lengths
         
         # Code detection patterns
         self._code_patterns = {
@@ -92,6 +107,17 @@ class VisionContextManager:
             'sql': [r'SELECT\s+', r'FROM\s+', r'WHERE\s+', r'INSERT\s+INTO', r'CREATE\s+TABLE']
         }
         
+        # Single alternation over every language pattern; the matching group
+        # name ("<lang>_<n>") identifies the language in one search
+        self._code_union = re.compile(
+            "|".join(
+                f"(?P<{lang}_{i}>{pattern})"
+                for lang, patterns in self._code_patterns.items()
+                for i, pattern in enumerate(patterns)
+            ),
+            re.IGNORECASE
+        )
+        
         # Question type patterns
         self._question_patterns = {
             'coding': [r'write\s+a?\s*(function|code|program)', r'implement', r'solve', r'algorithm'],
@@ -142,6 +168,12 @@ class VisionContextManager:
     def set_resume_context(self, resume_data: Dict[str, Any]):
         """Set static resume context."""
         content = self._format_resume_context(resume_data)
+        self._skill_set = frozenset(
+            tokens
+            for skill in [*(resume_data.get('skills') or []), *(resume_data.get('languages') or [])]
+            if (tokens := _skill_tokens(skill))
+        )
+        self._skill_lengths = frozenset(map(len, self._skill_set))
         self._static_context['resume'] = ContextItem(
             source=ContextSource.RESUME_DATA,
             content=content,
@@ -161,6 +193,23 @@ class VisionContextManager:
             parts.append(f"Experience: {resume_data['experience']}")
         return " | ".join(parts) if parts else ""
     
+    def score_against(self, text: str) -> int:
+        """
+        Count resume skills/languages that appear in the given text.
+        
+        Skills and text are tokenized alike; multi-word skills ("machine
+        learning") match as consecutive tokens.
+        """
+        if not self._skill_set or not text:
+            return 0
+        tokens = _skill_tokens(text)
+        grams = {
+            tokens[i:i + n]
+            for n in self._skill_lengths
+            for i in range(len(tokens) - n + 1)
+        }
+        return len(self._skill_set & grams)
+    
     def get_merged_context(self, question: Optional[str] = None) -> MergedContext:
         """
         Merge all context sources with proper prioritization.
@@ -190,7 +239,7 @@ class VisionContextManager:
         # Build merged context
         primary_parts = []
         supporting_parts = []
-        sources_used = set()
+        sources_mask = 0
         total_tokens = 0
         
         # Screen content first (TRUTH)
@@ -198,10 +247,10 @@ class VisionContextManager:
             if item.source == ContextSource.SCREEN_OCR and item.age_seconds < 30:
                 text = item.content.strip()
                 if text and len(text) > 10:
-                    tokens = len(text.split())
+                    tokens = self._estimate_tokens(text)
                     if total_tokens + tokens <= self.max_tokens:
                         primary_parts.append(f"[SCREEN] {text}")
-                        sources_used.add(item.source)
+                        sources_mask |= _SOURCE_BITS[item.source]
                         total_tokens += tokens
         
         # Audio transcript
@@ -209,10 +258,10 @@ class VisionContextManager:
                           key=lambda x: x.timestamp, reverse=True)[:5]:
             text = item.content.strip()
             if text:
-                tokens = len(text.split())
+                tokens = self._estimate_tokens(text)
                 if total_tokens + tokens <= self.max_tokens:
                     supporting_parts.append(f"[HEARD] {text}")
-                    sources_used.add(item.source)
+                    sources_mask |= _SOURCE_BITS[item.source]
                     total_tokens += tokens
         
         # Conversation history
@@ -220,19 +269,19 @@ class VisionContextManager:
                           key=lambda x: x.timestamp, reverse=True)[:10]:
             text = item.content.strip()
             if text:
-                tokens = len(text.split())
+                tokens = self._estimate_tokens(text)
                 if total_tokens + tokens <= self.max_tokens:
                     supporting_parts.append(text)
-                    sources_used.add(item.source)
+                    sources_mask |= _SOURCE_BITS[item.source]
                     total_tokens += tokens
         
         # Resume context (if room)
         if 'resume' in self._static_context:
             resume_item = self._static_context['resume']
-            tokens = len(resume_item.content.split())
+            tokens = self._estimate_tokens(resume_item.content)
             if total_tokens + tokens <= self.max_tokens:
                 supporting_parts.append(f"[BACKGROUND] {resume_item.content}")
-                sources_used.add(resume_item.source)
+                sources_mask |= _SOURCE_BITS[resume_item.source]
                 total_tokens += tokens
         
         # Calculate overall confidence
@@ -246,10 +295,15 @@ class VisionContextManager:
             detected_language=detected_language,
             question_type=question_type,
             confidence=confidence,
-            sources_used=list(sources_used),
+            sources_used=[s for s in ContextSource if sources_mask & _SOURCE_BITS[s]],
             token_count=total_tokens
         )
     
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token estimate (~4 chars per token) without splitting the text."""
+        return max(1, len(text) >> 2)
+    
     def _detect_question_type(self, question: str) -> str:
         """Detect type of interview question."""
         question_lower = question.lower()
@@ -288,11 +342,10 @@ class VisionContextManager:
                 continue
             
             # Detect language from patterns
-            for lang, patterns in self._code_patterns.items():
-                for pattern in patterns:
-                    if re.search(pattern, content, re.IGNORECASE):
-                        detected_language = detected_language or lang
-                        break
+            if detected_language is None:
+                pattern_match = self._code_union.search(content)
+                if pattern_match:
+                    detected_language = pattern_match.lastgroup.rsplit('_', 1)[0]
         
         combined_code = "\n\n".join(code_blocks) if code_blocks else None
         return combined_code, detected_language
@@ -332,8 +385,10 @@ class VisionContextManager:
         # Simple heuristic: check for negation or vastly different content
         negation_patterns = [r'\bnot\b', r'\bno\b', r"\bisn't\b", r"\bwasn't\b"]
         
-        has_negation_1 = any(re.search(p, text1.lower()) for p in negation_patterns)
-        has_negation_2 = any(re.search(p, text2.lower()) for p in negation_patterns)
+        text1_lower = text1.lower()
+        text2_lower = text2.lower()
+        has_negation_1 = any(re.search(p, text1_lower) for p in negation_patterns)
+        has_negation_2 = any(re.search(p, text2_lower) for p in negation_patterns)
         
         return has_negation_1 != has_negation_2
     
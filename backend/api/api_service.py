@@ -2,10 +2,23 @@
 FastAPI Backend Service
 Exposes all interview assistant capabilities via REST API
 """
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from enum import Enum
+from functools import lru_cache, partial
+import asyncio
+import os
+import threading
+import uuid
+import anyio
+import orjson
 import uvicorn
 import logging
 from pathlib import Path
@@ -20,16 +33,36 @@ from backend.ai.difficulty_scaler import create_scaler_from_resume, DifficultySc
 from backend.ai.scoring_rubrics import score_answer, QuestionType, ScoringResult
 from backend.ai.interview_engine import InterviewEngine
 from backend.ai.resume_parser import ResumeParser
+from config import API_HOST, API_PORT, API_WORKERS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create FastAPI app
+# Worker threads available to CPU-heavy endpoints (anyio default is 40)
+THREAD_LIMIT = 100
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup/shutdown hook."""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREAD_LIMIT
+    # Code validation and scoring run in worker processes (GIL-free, isolated from user code)
+    # (split the cores between uvicorn workers so N workers don't spawn N*cores processes)
+    app.state.pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) // API_WORKERS))
+    try:
+        yield
+    finally:
+        app.state.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Create FastAPI app (ORJSONResponse renders any route that returns a plain value)
 app = FastAPI(
     title="Interview Assistant API",
     description="Comprehensive interview preparation and assistance API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS
@@ -41,9 +74,94 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global state (in production, use proper state management)
-sessions: Dict[str, Dict] = {}
-scalers: Dict[str, DifficultyScaler] = {}
+# Compress large payloads (reports, diagrams, test results); low level keeps CPU cost down
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+class ShardedStore:
+    """
+    Thread-safe in-memory map split into lock-guarded shards, so concurrent
+    requests for different sessions rarely contend on the same lock.
+    State is per process; multi-worker deployments need an external store.
+    """
+    
+    def __init__(self, num_shards: int = 16):
+        self._shards: List[Dict[str, Any]] = [{} for _ in range(num_shards)]
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+    
+    def _index(self, key: str) -> int:
+        return hash(key) % len(self._shards)
+    
+    def lock(self, key: str) -> threading.Lock:
+        """Lock guarding the shard that holds key (for compound updates)."""
+        return self._locks[self._index(key)]
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        idx = self._index(key)
+        with self._locks[idx]:
+            return self._shards[idx].get(key, default)
+    
+    def set(self, key: str, value: Any):
+        idx = self._index(key)
+        with self._locks[idx]:
+            self._shards[idx][key] = value
+    
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+# Global state (per process)
+sessions = ShardedStore()
+scalers = ShardedStore()
+engines: Dict[str, InterviewEngine] = {}  # LLM engines by role, created lazily
+
+
+def _get_engine(role: str) -> InterviewEngine:
+    """Get (or create) the answer-generation engine for a role."""
+    engine = engines.get(role)
+    if engine is None:
+        engine = engines.setdefault(role, InterviewEngine(role=role))
+    return engine
+
+
+async def _run_in_pool(func, *args, **kwargs) -> Any:
+    """Run a CPU-bound, picklable function in the worker process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(app.state.pool, partial(func, *args, **kwargs))
+
+
+@lru_cache(maxsize=256)
+def _cached_component_diagram(services: tuple, databases: tuple, caches: tuple,
+                              queues: tuple, workers: tuple) -> str:
+    """Mermaid for explicit components, memoized on the (ordered) component lists."""
+    return generate_mermaid_from_components(
+        services=list(services),
+        databases=list(databases),
+        caches=list(caches),
+        queues=list(queues),
+        workers=list(workers)
+    )
+
+
+@lru_cache(maxsize=256)
+def _cached_design_diagram(design_text: str) -> str:
+    """Mermaid parsed from design text, memoized on the text."""
+    return render_system_design(design_text)
+
+
+def _orjson_default(obj: Any) -> Any:
+    """Serialize types orjson doesn't handle natively."""
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+def _json_response(content: Any) -> Response:
+    """Serialize content straight to a JSON Response."""
+    return Response(orjson.dumps(content, default=_orjson_default), media_type="application/json")
 
 
 # ============= Request/Response Models =============
@@ -77,6 +195,14 @@ class AnswerEvaluateRequest(BaseModel):
     question_type: str  # coding, behavioral, system_design
     code: Optional[str] = None
     explanation: Optional[str] = None
+    language: str = "python"
+    test_cases: Optional[List[Dict]] = None  # Run against code when provided
+
+
+class AnswerStreamRequest(BaseModel):
+    session_id: str
+    question: str
+    screen_context: Optional[str] = None
 
 
 class CodeValidateRequest(BaseModel):
@@ -96,32 +222,36 @@ class SystemDesignRequest(BaseModel):
 
 
 # ============= Endpoints =============
+# Routes return Responses built by _json_response (streams excepted): FastAPI
+# passes a Response through as-is, skipping both the Pydantic validation pass
+# and jsonable_encoder. response_model=None keeps return annotations from
+# reintroducing validation.
 
-@app.get("/")
-def root():
+@app.get("/", response_model=None)
+async def root():
     """Health check"""
-    return {
+    return _json_response({
         "status": "online",
         "service": "Interview Assistant API",
         "version": "1.0.0"
-    }
+    })
 
 
-@app.post("/session/start")
-def start_session(request: SessionStartRequest):
+@app.post("/session/start", response_model=None)
+async def start_session(request: SessionStartRequest):
     """
     Start new interview session
     
     Initializes difficulty scaler based on resume
     """
     try:
-        session_id = f"session_{len(sessions) + 1}"
+        session_id = f"session_{uuid.uuid4().hex}"
         
         # Parse resume if provided
         resume_skills = None
         if request.resume_text:
-            scaler = create_scaler_from_resume(request.resume_text)
-            scalers[session_id] = scaler
+            scaler = await anyio.to_thread.run_sync(create_scaler_from_resume, request.resume_text)
+            scalers.set(session_id, scaler)
             resume_skills = {
                 "languages": scaler.resume_skills.languages,
                 "frameworks": scaler.resume_skills.frameworks,
@@ -130,31 +260,34 @@ def start_session(request: SessionStartRequest):
             }
         
         # Create session
-        sessions[session_id] = {
+        sessions.set(session_id, {
             "user_id": request.user_id,
             "role": request.role,
             "questions_asked": [],
             "performance_history": [],
+            "score_sum": 0.0,
+            "score_count": 0,
+            "category_stats": {},  # category -> {sum, count, first, last}
             "start_time": None,
             "resume_skills": resume_skills
-        }
+        })
         
-        logger.info(f"Started session {session_id} for {request.user_id}")
+        logger.info("Started session %s for %s", session_id, request.user_id)
         
-        return {
+        return _json_response({
             "session_id": session_id,
             "status": "started",
             "resume_skills": resume_skills,
             "message": "Session initialized. Ready for questions."
-        }
+        })
     
     except Exception as e:
-        logger.error(f"Session start error: {e}")
+        logger.error("Session start error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/transcribe")
-def transcribe_audio(request: TranscribeRequest):
+@app.post("/transcribe", response_model=None)
+async def transcribe_audio(request: TranscribeRequest):
     """
     Transcribe audio to text using Whisper
     
@@ -163,20 +296,20 @@ def transcribe_audio(request: TranscribeRequest):
     try:
         # In production, use actual Whisper API
         # For now, return mock
-        return {
+        return _json_response({
             "transcript": "This is a mock transcription",
             "speaker": "INTERVIEWER",
             "confidence": 0.95,
             "processing_time": 0.5
-        }
+        })
     
     except Exception as e:
-        logger.error(f"Transcription error: {e}")
+        logger.error("Transcription error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/ocr")
-def process_ocr(request: OCRRequest):
+@app.post("/ocr", response_model=None)
+async def process_ocr(request: OCRRequest):
     """
     Extract text from screen capture via OCR
     
@@ -185,20 +318,20 @@ def process_ocr(request: OCRRequest):
     try:
         # In production, use actual Tesseract
         # For now, return mock
-        return {
+        return _json_response({
             "text": "Mock OCR text",
             "coding_question_detected": False,
             "confidence": 0.85,
             "processing_time": 0.3
-        }
+        })
     
     except Exception as e:
-        logger.error(f"OCR error: {e}")
+        logger.error("OCR error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/question/next")
-def get_next_question(request: QuestionRequest):
+@app.post("/question/next", response_model=None)
+async def get_next_question(request: QuestionRequest):
     """
     Get next question based on difficulty scaling
     
@@ -220,31 +353,32 @@ def get_next_question(request: QuestionRequest):
         else:
             difficulty = Difficulty.MEDIUM
         
-        # Generate question (mock for now)
-        question = {
-            "id": f"q_{len(session['questions_asked']) + 1}",
-            "category": request.category,
-            "difficulty": difficulty.value,
-            "text": f"Sample {difficulty.value} {request.category} question",
-            "expected_time": 600,  # 10 minutes
-            "hints": ["Hint 1", "Hint 2"],
-            "follow_up_intensity": scaler.get_follow_up_intensity(request.category) if scaler else "moderate"
-        }
-        
-        # Track question
-        session["questions_asked"].append(question)
+        with sessions.lock(request.session_id):
+            # Generate question (mock for now)
+            question = {
+                "id": f"q_{len(session['questions_asked']) + 1}",
+                "category": request.category,
+                "difficulty": difficulty.value,
+                "text": f"Sample {difficulty.value} {request.category} question",
+                "expected_time": 600,  # 10 minutes
+                "hints": ["Hint 1", "Hint 2"],
+                "follow_up_intensity": scaler.get_follow_up_intensity(request.category) if scaler else "moderate"
+            }
+            
+            # Track question
+            session["questions_asked"].append(question)
         
-        logger.info(f"Generated {difficulty.value} question for session {request.session_id}")
+        logger.info("Generated %s question for session %s", difficulty.value, request.session_id)
         
-        return question
+        return _json_response(question)
     
     except Exception as e:
-        logger.error(f"Question generation error: {e}")
+        logger.error("Question generation error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/answer/evaluate")
-def evaluate_answer(request: AnswerEvaluateRequest):
+@app.post("/answer/evaluate", response_model=None)
+async def evaluate_answer(request: AnswerEvaluateRequest):
     """
     Evaluate answer using appropriate rubric
     
@@ -276,68 +410,134 @@ def evaluate_answer(request: AnswerEvaluateRequest):
         # Additional kwargs for coding
         kwargs = {}
         if qtype == QuestionType.CODING and request.code:
-            # Would run validation here
-            kwargs["validation_result"] = {"passed": True, "test_results": []}
+            if request.test_cases:
+                # Correctness scoring consumes the validation output, so this
+                # must finish before scoring (both run in the process pool)
+                validation = await _run_in_pool(
+                    validate_code,
+                    code=request.code,
+                    language=request.language,
+                    test_cases=request.test_cases
+                )
+                kwargs["validation_result"] = {
+                    "passed": validation.passed,
+                    "test_results": validation.test_results
+                }
+            else:
+                kwargs["validation_result"] = {"passed": True, "test_results": []}
             kwargs["explanation"] = request.explanation or ""
         
-        # Score answer
-        result = score_answer(
+        # Score answer (CPU-bound, runs in the process pool)
+        result = await _run_in_pool(
+            score_answer,
             qtype,
             request.answer,
             proficiency_level=proficiency_level,
             **kwargs
         )
         
-        # Update performance in scaler
-        if scaler:
-            scaler.update_performance(
-                category=request.question_type,
-                correctness=result.overall_score / 100,
-                time_taken=300,  # Would track actual time
-                clarity_score=0.8,
-                depth_score=0.75
-            )
-        
-        # Track performance
-        session["performance_history"].append({
-            "question": request.question,
-            "score": result.overall_score,
-            "category": request.question_type
-        })
+        with sessions.lock(request.session_id):
+            # Update performance in scaler
+            if scaler:
+                scaler.update_performance(
+                    category=request.question_type,
+                    correctness=result.overall_score / 100,
+                    time_taken=300,  # Would track actual time
+                    clarity_score=0.8,
+                    depth_score=0.75
+                )
+            
+            # Track performance
+            score = result.overall_score
+            session["performance_history"].append({
+                "question": request.question,
+                "score": score,
+                "category": request.question_type
+            })
+            
+            # Running aggregates for the session report
+            session["score_sum"] += score
+            session["score_count"] += 1
+            stats = session["category_stats"].get(request.question_type)
+            if stats is None:
+                session["category_stats"][request.question_type] = {
+                    "sum": score, "count": 1, "first": score, "last": score
+                }
+            else:
+                stats["sum"] += score
+                stats["count"] += 1
+                stats["last"] = score
         
-        logger.info(f"Evaluated {request.question_type} answer: {result.overall_score}/100")
+        logger.info("Evaluated %s answer: %s/100", request.question_type, result.overall_score)
         
-        return {
+        return _json_response({
             "score": result.overall_score,
             "category_scores": result.category_scores,
             "strengths": result.strengths,
             "improvements": result.improvements,
             "feedback": result.feedback,
             "proficiency_level": proficiency_level
-        }
+        })
     
     except Exception as e:
-        logger.error(f"Evaluation error: {e}")
+        logger.error("Evaluation error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/code/validate")
-def validate_code_endpoint(request: CodeValidateRequest):
+@app.post("/answer/stream", response_model=None)
+async def stream_answer(request: AnswerStreamRequest):
+    """
+    Stream a coached answer as it is generated
+    
+    Returns NDJSON lines: {"partial": "..."} per chunk, then {"done": true}
+    """
+    session = sessions.get(request.session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    engine = _get_engine(session["role"])
+    skills = session["resume_skills"] or {}
+    resume_context = ", ".join(skills.get("languages", []) + skills.get("frameworks", []))
+    
+    async def stream_results():
+        try:
+            async for chunk in engine.generate_answer_stream(
+                request.question,
+                resume_context=resume_context,
+                screen_context=request.screen_context or ""
+            ):
+                yield orjson.dumps({"partial": chunk}) + b"\n"
+        except Exception as e:
+            logger.error("Answer streaming error: %s", e)
+            yield orjson.dumps({"error": str(e)}) + b"\n"
+        yield orjson.dumps({"done": True}) + b"\n"
+    
+    # Explicit Content-Encoding makes GZipMiddleware pass chunks through unbuffered
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/x-ndjson",
+        headers={"Content-Encoding": "identity"}
+    )
+
+
+@app.post("/code/validate", response_model=None)
+async def validate_code_endpoint(request: CodeValidateRequest):
     """
     Validate code with static checks + runtime tests
     
     Returns test results and complexity warnings
     """
     try:
-        result = validate_code(
+        result = await _run_in_pool(
+            validate_code,
             code=request.code,
             language=request.language,
             test_cases=request.test_cases
         )
         
-        logger.info(f"Validated {request.language} code: {result.passed}")
+        logger.info("Validated %s code: %s", request.language, result.passed)
         
-        return {
+        return _json_response({
             "passed": result.passed,
             "test_results": result.test_results,
             "syntax_valid": result.syntax_valid,
@@ -346,15 +546,15 @@ def validate_code_endpoint(request: CodeValidateRequest):
             "memory_estimate": result.memory_estimate,
             "error_message": result.error_message,
             "counterexamples": result.counterexamples
-        }
+        })
     
     except Exception as e:
-        logger.error(f"Validation error: {e}")
+        logger.error("Validation error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/systemdesign/render")
-def render_diagram(request: SystemDesignRequest):
+@app.post("/systemdesign/render", response_model=None)
+async def render_diagram(request: SystemDesignRequest):
     """
     Render system design as Mermaid diagram
     
@@ -362,33 +562,42 @@ def render_diagram(request: SystemDesignRequest):
     """
     try:
         if request.structured and request.services:
-            # Use explicit components
-            mermaid = generate_mermaid_from_components(
-                services=request.services,
-                databases=request.databases or [],
-                caches=request.caches,
-                queues=request.queues,
-                workers=request.workers
+            # Use explicit components (order matters: first db/cache/queue get the edges)
+            mermaid = await anyio.to_thread.run_sync(
+                _cached_component_diagram,
+                tuple(request.services),
+                tuple(request.databases or ()),
+                tuple(request.caches or ()),
+                tuple(request.queues or ()),
+                tuple(request.workers or ())
             )
         else:
             # Parse from text
-            mermaid = render_system_design(request.design_text)
+            mermaid = await anyio.to_thread.run_sync(_cached_design_diagram, request.design_text)
         
         logger.info("Generated Mermaid diagram")
         
-        return {
+        return _json_response({
             "mermaid": mermaid,
             "format": "mermaid",
             "preview_url": None  # Could generate image preview
-        }
+        })
     
     except Exception as e:
-        logger.error(f"Diagram rendering error: {e}")
+        logger.error("Diagram rendering error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/session/report/{session_id}")
-def get_session_report(session_id: str):
+@app.post("/systemdesign/cache/clear", response_model=None)
+async def clear_diagram_cache():
+    """Drop memoized Mermaid diagrams"""
+    _cached_component_diagram.cache_clear()
+    _cached_design_diagram.cache_clear()
+    return _json_response({"status": "cleared"})
+
+
+@app.get("/session/report/{session_id}", response_model=None)
+async def get_session_report(session_id: str):
     """
     Get comprehensive session report
     
@@ -401,9 +610,9 @@ def get_session_report(session_id: str):
         
         scaler = scalers.get(session_id)
         
-        # Calculate summary
-        performance = session["performance_history"]
-        avg_score = sum(p["score"] for p in performance) / len(performance) if performance else 0
+        # Calculate summary (from running aggregates)
+        count = session["score_count"]
+        avg_score = session["score_sum"] / count if count else 0
         
         # Get proficiency summary from scaler
         proficiency_summary = scaler.get_performance_summary() if scaler else {}
@@ -413,56 +622,56 @@ def get_session_report(session_id: str):
             "role": session["role"],
             "questions_attempted": len(session["questions_asked"]),
             "average_score": round(avg_score, 1),
-            "performance_by_category": {},
+            "performance_by_category": {
+                cat: {
+                    "average": round(stats["sum"] / stats["count"], 1),
+                    "attempts": stats["count"],
+                    "trend": "improving" if stats["count"] > 1 and stats["last"] > stats["first"] else "stable"
+                }
+                for cat, stats in session["category_stats"].items()
+            },
             "proficiency_summary": proficiency_summary,
             "strengths": proficiency_summary.get("strengths", []),
             "areas_to_improve": proficiency_summary.get("areas_to_improve", []),
             "resume_skills": session["resume_skills"]
         }
         
-        # Group by category
-        for perf in performance:
-            cat = perf["category"]
-            if cat not in report["performance_by_category"]:
-                report["performance_by_category"][cat] = []
-            report["performance_by_category"][cat].append(perf["score"])
+        logger.info("Generated report for session %s", session_id)
         
-        # Average per category
-        for cat in report["performance_by_category"]:
-            scores = report["performance_by_category"][cat]
-            report["performance_by_category"][cat] = {
-                "average": round(sum(scores) / len(scores), 1),
-                "attempts": len(scores),
-                "trend": "improving" if len(scores) > 1 and scores[-1] > scores[0] else "stable"
-            }
-        
-        logger.info(f"Generated report for session {session_id}")
-        
-        return report
+        return _json_response(report)
     
     except Exception as e:
-        logger.error(f"Report generation error: {e}")
+        logger.error("Report generation error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/health")
-def health_check():
+@app.get("/health", response_model=None)
+async def health_check():
     """Detailed health check"""
-    return {
+    return _json_response({
         "status": "healthy",
         "active_sessions": len(sessions),
         "scalers_active": len(scalers),
         "version": "1.0.0"
-    }
+    })
 
 
 # ============= Run Server =============
 
 if __name__ == "__main__":
+    if API_WORKERS > 1:
+        logger.warning("Running %s workers: sessions are per worker, "
+                       "route each session to the same worker", API_WORKERS)
+    
     uvicorn.run(
         "api_service:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
+        host=API_HOST,
+        port=API_PORT,
+        workers=API_WORKERS,
+        reload=API_WORKERS == 1,  # Reload forces a single worker
+        backlog=2048,
+        access_log=False,  # Per-request access lines cost more than the hot endpoints
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
         log_level="info"
     )
@@ -4,16 +4,77 @@ Deterministic, transcript-driven answer generation
 """
 import re
 import logging
+import queue
 import time
-from typing import Optional
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from dataclasses import dataclass
 
 from backend.audio.parakeet_audio import TranscriptEvent, Speaker
 
 logger = logging.getLogger(__name__)
 
+# Optional: Hyperscan compiles all intent rules into one SIMD DFA
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
 
-@dataclass
+# Hyperscan pattern ids double as rule priority (lower wins)
+_HS_IMPERATIVE = 1
+_HS_CONTEXTUAL = 2
+
+# Static sections of the structured answer prompt
+_PROMPT_HEAD = """You are an expert interview assistant. Answer the following question in a structured, step-by-step format.
+
+QUESTION:
+"""
+
+_PROMPT_BODY = """
+
+ANSWER STRUCTURE (MANDATORY):
+
+1. PROBLEM RESTATEMENT
+   - Rephrase the problem in your own words
+   - Identify key requirements
+
+2. APPROACH EXPLANATION
+   - Explain your strategy at a high level
+   - Justify why this approach works
+
+3. STEP-BY-STEP LOGIC
+   - Break down the solution into clear steps
+   - Explain the reasoning for each step
+
+4. CODE IMPLEMENTATION
+   - Provide clean, well-commented code
+   - Use best practices and proper naming
+"""
+
+_PROMPT_TAIL = """
+5. COMPLEXITY ANALYSIS
+   - Time complexity: O(?)
+   - Space complexity: O(?)
+   - Explain the complexity reasoning
+
+Keep the answer concise but complete. Focus on clarity and correctness.
+"""
+
+# Languages looked for in the resume, in preference order
+_RESUME_LANGUAGES = ('Python', 'Java', 'JavaScript', 'C++', 'Go')
+
+
+@lru_cache(maxsize=64)
+def _preferred_language(resume_context: str) -> str:
+    """First known language mentioned in the resume (default: Python)."""
+    context_lower = resume_context.lower()
+    for lang in _RESUME_LANGUAGES:
+        if lang.lower() in context_lower:
+            return lang
+    return 'Python'
+
+
+@dataclass(slots=True, frozen=True)
 class QuestionIntent:
     """Detected question intent"""
     text: str
@@ -36,9 +97,11 @@ class ParakeetDecisionEngine:
     """
     
     def __init__(self):
-        self.cooldown_active = False
-        self.last_answer_time = 0
         self.cooldown_duration = 2.0  # seconds
+        self._cooldown_deadline_ns = 0  # monotonic deadline, 0 = no cooldown
+        
+        # Finalized events waiting for the next batched decision pass
+        self._pending: "queue.SimpleQueue[TranscriptEvent]" = queue.SimpleQueue()
         
         # Question detection patterns (deterministic NLP + regex)
         self.imperative_verbs = [
@@ -54,6 +117,17 @@ class ParakeetDecisionEngine:
             'given this', 'for this', 'with this'
         ]
         
+        # Precompiled matchers (text is lowercased before matching):
+        # imperative = starts with a verb or contains " verb "
+        verbs = '|'.join(map(re.escape, self.imperative_verbs))
+        self._imperative_re = re.compile(f'^(?:{verbs})| (?:{verbs}) ')
+        self._contextual_re = re.compile('|'.join(map(re.escape, self.contextual_phrases)))
+        
+        self._hs_db = self._compile_hyperscan(verbs) if hyperscan is not None else None
+        
+        # Memoized rule matching, keyed on normalized text (bounded)
+        self._match_intent = lru_cache(maxsize=1024)(self._match_intent_uncached)
+        
         logger.info("Parakeet decision engine initialized")
     
     def should_generate_answer(self, event: TranscriptEvent, screen_changed: bool = False) -> bool:
@@ -75,28 +149,64 @@ class ParakeetDecisionEngine:
         """
         # Condition 1: Must be INTERVIEWER
         if event.speaker != Speaker.INTERVIEWER:
-            logger.debug(f"❌ Gate failed: speaker={event.speaker.name} (not INTERVIEWER)")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"❌ Gate failed: speaker={event.speaker.name} (not INTERVIEWER)")
             return False
         
         # Condition 2: Text finalized (guaranteed by TranscriptEvent)
         # This is enforced by the audio processor
         
         # Condition 3: Must match question intent
-        intent = self.detect_question_intent(event.text)
+        intent = self.detect_question_intent(event.text, event.text_lower)
         if not intent:
-            logger.debug(f"❌ Gate failed: no question intent in '{event.text[:30]}...'")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"❌ Gate failed: no question intent in '{event.text[:30]}...'")
             return False
         
         # Condition 4: Cooldown must be inactive
         if self.cooldown_active:
-            logger.debug(f"❌ Gate failed: cooldown active")
+            logger.debug("❌ Gate failed: cooldown active")
             return False
         
         # All conditions passed
-        logger.info(f"✅ Gate PASSED: Generating answer for question")
+        logger.info("✅ Gate PASSED: Generating answer for question")
         return True
     
-    def detect_question_intent(self, text: str) -> Optional[QuestionIntent]:
+    def enqueue(self, event: TranscriptEvent):
+        """Queue a finalized event for the next batched decision pass (thread-safe)"""
+        self._pending.put(event)
+    
+    def drain_pending(self) -> Optional[TranscriptEvent]:
+        """
+        Batched decision gate over every queued event
+        
+        Interviewer speech in the batch releases cooldown (as on_interviewer_spoke
+        would per event); then should_generate_answer is applied newest first
+        and the first event that passes is returned, so a burst of utterances
+        yields at most one answer.
+        
+        Returns:
+            Event to answer, or None if no queued event passes the gate
+        """
+        events: List[TranscriptEvent] = []
+        while True:
+            try:
+                events.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        
+        if not any(e.speaker == Speaker.INTERVIEWER for e in events):
+            return None
+        
+        self.on_interviewer_spoke()
+        
+        for event in reversed(events):
+            if self.should_generate_answer(event):
+                return event
+        
+        return None
+    
+    def detect_question_intent(self, text: str, text_lower: Optional[str] = None) -> Optional[QuestionIntent]:
         """
         Question Intent Detection (PARAKEET STYLE)
         
@@ -109,39 +219,84 @@ class ParakeetDecisionEngine:
         
         Args:
             text: Transcript text
+            text_lower: Pre-normalized (lowercased, stripped) text, if the caller has it
             
         Returns:
             QuestionIntent if detected, None otherwise
         """
-        text_lower = text.lower().strip()
-        
         # Rule 1: Direct question (ends with ?)
-        if text.endswith('?'):
+        if text[-1:] == '?':
             return QuestionIntent(
                 text=text,
                 confidence=0.95,
                 question_type="direct"
             )
         
+        # Rules 2-3 only depend on the normalized text (cached)
+        if text_lower is None:
+            text_lower = text.lower().strip()
+        match = self._match_intent(text_lower)
+        if match is None:
+            # No question intent detected
+            return None
+        
+        confidence, question_type = match
+        return QuestionIntent(
+            text=text,
+            confidence=confidence,
+            question_type=question_type
+        )
+    
+    def _compile_hyperscan(self, verbs: str):
+        """Compile imperative + contextual rules into a single Hyperscan database"""
+        try:
+            db = hyperscan.Database()
+            db.compile(
+                expressions=[
+                    f'^(?:{verbs})| (?:{verbs}) '.encode(),
+                    '|'.join(map(re.escape, self.contextual_phrases)).encode()
+                ],
+                ids=[_HS_IMPERATIVE, _HS_CONTEXTUAL],
+                elements=2,
+                flags=[0, 0]
+            )
+            return db
+        except Exception as e:
+            logger.warning(f"Hyperscan unavailable, using regex matching: {e}")
+            return None
+    
+    def _match_intent_uncached(self, text_lower: str) -> Optional[Tuple[float, str]]:
+        """Apply imperative/contextual rules, returning (confidence, question_type)"""
+        if self._hs_db is not None:
+            return self._match_intent_hyperscan(text_lower)
+        
         # Rule 2: Imperative verb (command)
-        for verb in self.imperative_verbs:
-            if text_lower.startswith(verb) or f" {verb} " in text_lower:
-                return QuestionIntent(
-                    text=text,
-                    confidence=0.90,
-                    question_type="imperative"
-                )
+        if self._imperative_re.search(text_lower):
+            return 0.90, "imperative"
         
         # Rule 3: Contextual reference (screen/code)
-        for phrase in self.contextual_phrases:
-            if phrase in text_lower:
-                return QuestionIntent(
-                    text=text,
-                    confidence=0.85,
-                    question_type="contextual"
-                )
-        
-        # No question intent detected
+        if self._contextual_re.search(text_lower):
+            return 0.85, "contextual"
+        
+        return None
+    
+    def _match_intent_hyperscan(self, text_lower: str) -> Optional[Tuple[float, str]]:
+        """Single Hyperscan pass over both rules (imperative outranks contextual)"""
+        matched = set()
+        
+        def on_match(pattern_id, start, end, flags, context):
+            matched.add(pattern_id)
+            return pattern_id == _HS_IMPERATIVE  # Stop scanning once the top rule hits
+        
+        try:
+            self._hs_db.scan(text_lower.encode(), match_event_handler=on_match)
+        except hyperscan.ScanTerminated:
+            pass  # Halted early by on_match
+        
+        if _HS_IMPERATIVE in matched:
+            return 0.90, "imperative"
+        if _HS_CONTEXTUAL in matched:
+            return 0.85, "contextual"
         return None
     
     def activate_cooldown(self):
@@ -150,10 +305,14 @@ class ParakeetDecisionEngine:
         
         CRITICAL: This prevents double answers and jitter
         """
-        self.cooldown_active = True
-        self.last_answer_time = time.time()
+        self._cooldown_deadline_ns = time.monotonic_ns() + int(self.cooldown_duration * 1e9)
         logger.info("🔒 Cooldown activated")
     
+    @property
+    def cooldown_active(self) -> bool:
+        """True until the cooldown is released or its deadline passes"""
+        return self._cooldown_deadline_ns > time.monotonic_ns()
+    
     def release_cooldown(self, reason: str = "interviewer spoke"):
         """
         Release cooldown
@@ -165,16 +324,14 @@ class ParakeetDecisionEngine:
         Args:
             reason: Why cooldown was released
         """
-        if self.cooldown_active:
-            self.cooldown_active = False
-            logger.info(f"🔓 Cooldown released: {reason}")
+        if self._cooldown_deadline_ns:
+            self._cooldown_deadline_ns = 0
+            logger.info("🔓 Cooldown released: %s", reason)
     
     def check_cooldown_timeout(self):
         """Check if cooldown should auto-release (timeout)"""
-        if self.cooldown_active:
-            elapsed = time.time() - self.last_answer_time
-            if elapsed > self.cooldown_duration:
-                self.release_cooldown("timeout")
+        if self._cooldown_deadline_ns and time.monotonic_ns() >= self._cooldown_deadline_ns:
+            self.release_cooldown("timeout")
     
     def on_interviewer_spoke(self):
         """Called when interviewer speaks - releases cooldown"""
@@ -200,6 +357,7 @@ class ParakeetAnswerFormatter:
     """
     
     @staticmethod
+    @lru_cache(maxsize=512)
     def format_prompt(question: str, resume_context: str = "") -> str:
         """
         Generate structured prompt for answer generation
@@ -211,50 +369,13 @@ class ParakeetAnswerFormatter:
         Returns:
             Formatted prompt for LLM
         """
-        prompt = f"""You are an expert interview assistant. Answer the following question in a structured, step-by-step format.
-
-QUESTION:
-{question}
-
-ANSWER STRUCTURE (MANDATORY):
-
-1. PROBLEM RESTATEMENT
-   - Rephrase the problem in your own words
-   - Identify key requirements
-
-2. APPROACH EXPLANATION
-   - Explain your strategy at a high level
-   - Justify why this approach works
-
-3. STEP-BY-STEP LOGIC
-   - Break down the solution into clear steps
-   - Explain the reasoning for each step
-
-4. CODE IMPLEMENTATION
-   - Provide clean, well-commented code
-   - Use best practices and proper naming
-"""
-
+        parts = [_PROMPT_HEAD, question, _PROMPT_BODY]
+        
         if resume_context:
-            # Extract preferred language from resume
-            languages = ['Python', 'Java', 'JavaScript', 'C++', 'Go']
-            preferred_lang = 'Python'  # default
-            for lang in languages:
-                if lang.lower() in resume_context.lower():
-                    preferred_lang = lang
-                    break
-            
-            prompt += f"   - Use {preferred_lang} (from resume)\n"
+            parts.append(f"   - Use {_preferred_language(resume_context)} (from resume)\n")
         
-        prompt += """
-5. COMPLEXITY ANALYSIS
-   - Time complexity: O(?)
-   - Space complexity: O(?)
-   - Explain the complexity reasoning
-
-Keep the answer concise but complete. Focus on clarity and correctness.
-"""
-        return prompt
+        parts.append(_PROMPT_TAIL)
+        return "".join(parts)
     
     @staticmethod
     def format_behavioral_prompt(question: str) -> str:
@@ -4,17 +4,46 @@ Transcript-driven, deterministic, speaker-gated system
 """
 import logging
 import threading
-import queue
 import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import sounddevice as sd
-from dataclasses import dataclass
-from typing import Optional, Callable
+from dataclasses import dataclass, field
+from typing import Optional, Callable, Dict, Tuple
 from enum import Enum
 
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 logger = logging.getLogger(__name__)
 
 
+def _frame_stats(frame: np.ndarray):
+    """Return (sum of squares, mean_abs) of an int16 frame"""
+    samples = frame.astype(np.float32, copy=False)
+    return float(np.dot(samples, samples)), np.abs(samples).mean()  # BLAS sdot
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _frame_stats(frame):
+        # Single integer pass: accumulate sum(x*x) and sum(|x|) together
+        sq = 0
+        ab = 0
+        for x in frame:
+            v = np.int64(x)
+            sq += v * v
+            ab += abs(v)
+        return sq, ab / len(frame)
+
+
 class Speaker(Enum):
     """Speaker types with priority order"""
     INTERVIEWER = 3  # Highest priority
@@ -22,13 +51,22 @@ class Speaker(Enum):
     NOISE = 1
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TranscriptEvent:
     """Finalized transcript event - the ONLY thing the system reasons on"""
     speaker: Speaker
     text: str
     confidence: float
-    timestamp: str
+    created_at: float  # Epoch seconds at end of speech
+    text_lower: str = field(init=False, repr=False)  # Normalized once for the decision engine
+    
+    def __post_init__(self):
+        object.__setattr__(self, "text_lower", self.text.lower().strip())
+    
+    @property
+    def timestamp(self) -> str:
+        """Local HH:MM:SS, formatted only when a consumer asks for it"""
+        return time.strftime("%H:%M:%S", time.localtime(self.created_at))
     
     def to_dict(self):
         return {
@@ -54,24 +92,40 @@ class ParakeetAudioProcessor:
     6. Transcript Event Emission
     """
     
-    def __init__(self, device_index: int = 1):
+    # Speaker embedding (optional diarization)
+    EMBEDDING_MODEL = "pyannote/wespeaker-voxceleb-resnet34-LM"
+    EMBEDDING_BATCH_SIZE = 8
+    EMBEDDING_WINDOW_S = 1.0
+    SPEAKER_MATCH_THRESHOLD = 0.5  # Cosine similarity to reuse an existing centroid
+    
+    def __init__(self, device_index: int = 1, diarization: bool = False):
         """
         Initialize Parakeet audio processor
         
         Args:
             device_index: Audio device (1 = Microphone Array)
+            diarization: Attribute speakers with a pyannote embedding model
+                (loaded lazily; falls back to the energy heuristic)
         """
         self.device_index = device_index
+        self.diarization = diarization
         self.sample_rate = 16000  # 16 kHz mono (standard)
         self.frame_duration = 30  # 30 ms chunks
         self.frame_size = int(self.sample_rate * self.frame_duration / 1000)
         
-        # Voice Activity Detection (Energy-based - simple but effective)
-        self.vad_threshold = 500  # Energy threshold for speech detection
+        # Voice Activity Detection: WebRTC VAD when available, energy-based otherwise
+        self.vad_threshold = 500  # Energy threshold for speech detection (fallback)
+        self.vad_energy_floor = 50  # Below this RMS the frame is silence, skip WebRTC VAD
+        # Thresholds as sum-of-squares over a frame, so VAD needs no mean/sqrt
+        self._vad_thresh_sq = self.vad_threshold ** 2 * self.frame_size
+        self._vad_floor_sq = self.vad_energy_floor ** 2 * self.frame_size
+        self._vad = webrtcvad.Vad(2) if webrtcvad is not None else None  # Aggressiveness 0-3
         
         # Speech buffer and state
         self.audio_buffer = []
-        self.speech_frames = []
+        self.max_utterance_seconds = 30
+        self._utt_buf = np.empty(self.sample_rate * self.max_utterance_seconds, dtype=np.int16)
+        self._utt_len = 0  # Write cursor into _utt_buf (samples)
         self.silence_threshold = 200  # ms of silence to finalize
         self.silence_frames = 0
         self.min_speech_frames = 10  # Minimum frames for valid speech
@@ -79,17 +133,32 @@ class ParakeetAudioProcessor:
         # Speaker state
         self.current_speaker = None
         self.speaker_confidence = 0.0
+        self._embedder = None
+        self._embed_device = None
+        self._embedder_failed = False
+        self._centroids: Dict[Speaker, np.ndarray] = {}  # Only touched by the STT worker
         
         # Threading
         self.running = False
-        self.audio_queue = queue.Queue()
+        # Lock-free SPSC ring between capture and processing threads.
+        # Only the capture thread writes _w, only the processor writes _r.
+        self.ring_slots = 64
+        self._ring = np.zeros((self.ring_slots, self.frame_size), dtype=np.int16)
+        self._frame = np.empty(self.frame_size, dtype=np.int16)  # Processor's private copy
+        self._w = 0
+        self._r = 0
+        self._overflows = 0  # Counted in the audio callback, logged by the capture thread
         self.capture_thread = None
         self.process_thread = None
+        self._recog_pool: Optional[ThreadPoolExecutor] = None  # Network STT off the process loop
+        self.recog_workers = 2  # Utterances in flight at once; events still emitted in order
+        self._last_emitted: Optional[threading.Event] = None  # Set once the previous utterance is emitted
         
         # Callbacks
         self.on_transcript_event: Optional[Callable[[TranscriptEvent], None]] = None
         
-        logger.info(f"Parakeet audio initialized: 16kHz, {self.frame_duration}ms frames, Energy-based VAD")
+        logger.info(f"Parakeet audio initialized: 16kHz, {self.frame_duration}ms frames, "
+                    f"{'WebRTC' if self._vad else 'Energy-based'} VAD")
     
     def start(self, on_transcript: Callable[[TranscriptEvent], None]):
         """
@@ -101,6 +170,9 @@ class ParakeetAudioProcessor:
         self.on_transcript_event = on_transcript
         self.running = True
         
+        self._recog_pool = ThreadPoolExecutor(max_workers=self.recog_workers, thread_name_prefix="parakeet-stt")
+        self._last_emitted = None
+        
         # Start capture thread
         self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
         self.capture_thread.start()
@@ -118,34 +190,53 @@ class ParakeetAudioProcessor:
             self.capture_thread.join(timeout=1)
         if self.process_thread:
             self.process_thread.join(timeout=1)
+        if self._recog_pool:
+            # Queued utterances still run so every ordering Event gets set
+            self._recog_pool.shutdown(wait=False)
+            self._recog_pool = None
         logger.info("Parakeet audio pipeline stopped")
     
     def _capture_loop(self):
-        """Audio capture loop - 16 kHz mono, chunked"""
+        """
+        Audio capture - 16 kHz mono, chunked
+        
+        PortAudio delivers each 30 ms block to _on_audio on its own audio
+        thread; this thread only keeps the stream open and reports overflows.
+        """
         try:
             with sd.InputStream(
                 device=self.device_index,
                 channels=1,
                 samplerate=self.sample_rate,
                 blocksize=self.frame_size,
-                dtype=np.int16
-            ) as stream:
+                dtype=np.int16,
+                callback=self._on_audio
+            ):
                 logger.info(f"Audio stream opened: device={self.device_index}")
                 
+                reported = 0
                 while self.running:
-                    # Read frame (30ms chunk)
-                    frame, overflowed = stream.read(self.frame_size)
-                    if overflowed:
-                        logger.warning("Audio buffer overflow")
-                    
-                    # Convert to bytes for VAD
-                    frame_bytes = frame.tobytes()
-                    self.audio_queue.put(frame_bytes)
+                    time.sleep(0.5)
+                    if self._overflows != reported:
+                        logger.warning(f"Audio buffer overflow ({self._overflows - reported} blocks)")
+                        reported = self._overflows
                     
         except Exception as e:
             logger.error(f"Audio capture error: {e}")
             self.running = False
     
+    def _on_audio(self, indata, frames, time_info, status):
+        """PortAudio callback: publish one int16 block into the ring (no allocation, no logging)"""
+        if status.input_overflow:
+            self._overflows += 1
+        if frames != self.frame_size:
+            return
+        
+        # Publish slot, then advance the write index
+        w = self._w
+        self._ring[w % self.ring_slots] = indata[:, 0]
+        self._w = w + 1
+    
     def _process_loop(self):
         """
         Processing loop - VAD → Speaker → Finalization → Transcript Event
@@ -154,30 +245,47 @@ class ParakeetAudioProcessor:
         """
         import speech_recognition as sr
         recognizer = sr.Recognizer()
+        slots = self.ring_slots
+        frame = self._frame
+        idle = self.frame_duration / 3000  # Poll a few times per frame
         
         while self.running:
             try:
-                # Get audio frame (blocking with timeout)
-                try:
-                    frame_bytes = self.audio_queue.get(timeout=0.1)
-                except queue.Empty:
+                # Get audio frame from the ring
+                r = self._r
+                w = self._w
+                if r == w:
+                    time.sleep(idle)
+                    continue
+                if w - r >= slots:
+                    # Fell behind - skip the slots the writer is overwriting
+                    logger.warning("Audio ring overrun, dropped %d frames", w - r - slots + 1)
+                    r = w - slots + 1
+                np.copyto(frame, self._ring[r % slots])
+                self._r = r + 1
+                if self._w - r >= slots:
+                    # Slot was rewritten while copying - discard torn frame
                     continue
                 
                 # Stage 1: Voice Activity Detection
-                is_speech = self._detect_voice_activity(frame_bytes)
+                is_speech, mean_abs = self._detect_voice_activity(frame)
                 
                 if is_speech:
-                    # Speech detected - add to buffer
-                    self.speech_frames.append(frame_bytes)
+                    # Speech detected - add to buffer (flush first if full)
+                    n = len(frame)
+                    if self._utt_len + n > len(self._utt_buf):
+                        self._finalize_speech(recognizer)
+                    self._utt_buf[self._utt_len:self._utt_len + n] = frame
+                    self._utt_len += n
                     self.silence_frames = 0
                     
                     # Stage 2: Speaker Attribution (simple heuristic for now)
                     # In production: use speaker diarization model
-                    self._attribute_speaker(frame_bytes)
+                    self._attribute_speaker(mean_abs)
                     
                 else:
                     # Silence detected
-                    if len(self.speech_frames) > 0:
+                    if self._utt_len > 0:
                         self.silence_frames += 1
                         
                         # Check if speech has ended (200ms silence)
@@ -189,32 +297,35 @@ class ParakeetAudioProcessor:
             except Exception as e:
                 logger.error(f"Processing error: {e}")
     
-    def _detect_voice_activity(self, frame_bytes: bytes) -> bool:
+    def _detect_voice_activity(self, frame: np.ndarray):
         """
-        Voice Activity Detection using energy-based method
+        Voice Activity Detection
         
-        Simple but effective: measures RMS energy of audio frame
-        Speech typically has higher energy than background noise
+        Uses WebRTC VAD (frequency-aware, rejects fan/hum noise) behind a
+        cheap RMS floor; falls back to the RMS energy threshold when
+        webrtcvad is not installed.
         
         Returns:
-            True if speech detected, False if silence/noise
+            (is_speech, mean_abs) - mean absolute amplitude is computed in
+            the same pass and reused for speaker attribution
         """
         try:
-            # Convert bytes to numpy array
-            frame = np.frombuffer(frame_bytes, dtype=np.int16)
+            energy_sq, mean_abs = _frame_stats(frame)
             
-            # Calculate RMS energy
-            rms_energy = np.sqrt(np.mean(frame**2))
+            if self._vad is not None:
+                # Cheap energy pre-filter, then WebRTC VAD (30 ms @ 16 kHz frames)
+                is_speech = (energy_sq > self._vad_floor_sq and
+                             self._vad.is_speech(frame.tobytes(), self.sample_rate))
+            else:
+                # Speech if energy above threshold
+                is_speech = energy_sq > self._vad_thresh_sq
             
-            # Speech if energy above threshold
-            is_speech = rms_energy > self.vad_threshold
-            
-            return is_speech
+            return is_speech, mean_abs
         except Exception as e:
             # logger.debug(f"VAD error: {e}")
-            return False
+            return False, 0.0
     
-    def _attribute_speaker(self, frame_bytes: bytes):
+    def _attribute_speaker(self, energy: float):
         """
         Speaker Attribution
         
@@ -224,10 +335,6 @@ class ParakeetAudioProcessor:
         
         In production: Use speaker diarization (pyannote.audio)
         """
-        # Convert to numpy for energy calculation
-        frame = np.frombuffer(frame_bytes, dtype=np.int16)
-        energy = np.abs(frame).mean()
-        
         # Simple threshold-based attribution
         # TODO: Replace with ML-based speaker diarization
         if energy > 1000:  # High energy
@@ -239,59 +346,168 @@ class ParakeetAudioProcessor:
     
     def _finalize_speech(self, recognizer):
         """
-        Stage 4: Finalize speech and emit transcript event
+        Stage 4: Finalize speech and hand it off for transcription
         
-        CRITICAL: This is the ONLY place transcripts are created
+        Snapshots the utterance, speaker state and end-of-speech time, then
+        submits recognition to the STT pool so the process loop never blocks
+        on serialization or the network.
         """
-        if len(self.speech_frames) < self.min_speech_frames:
+        if self._utt_len < self.min_speech_frames * self.frame_size:
             # Too short - discard
-            self.speech_frames = []
+            self._utt_len = 0
             self.silence_frames = 0
             return
         
         try:
-            # Combine frames into audio data
-            audio_data = b''.join(self.speech_frames)
-            
-            # Convert to AudioData for speech recognition
-            import speech_recognition as sr
-            audio = sr.AudioData(audio_data, self.sample_rate, 2)
-            
-            # Transcribe
+            # Snapshot (single copy) - the utterance buffer is reused immediately
+            audio_bytes = self._utt_buf[:self._utt_len].tobytes()
+            created_at = time.time()
+            prev, done = self._last_emitted, threading.Event()
+            self._last_emitted = done
+            self._recog_pool.submit(
+                self._transcribe_and_emit, recognizer, audio_bytes,
+                self.current_speaker, self.speaker_confidence, created_at, prev, done
+            )
+        except Exception as e:
+            logger.error(f"Finalization error: {e}")
+        
+        finally:
+            # Reset buffer
+            self._utt_len = 0
+            self.silence_frames = 0
+    
+    def _transcribe_and_emit(self, recognizer, audio_bytes: bytes, speaker: Speaker,
+                             confidence: float, created_at: float,
+                             prev: Optional[threading.Event], done: threading.Event):
+        """
+        Transcribe one utterance and emit its transcript event (STT worker thread)
+        
+        Recognition of consecutive utterances overlaps across workers; each
+        waits for its predecessor before diarizing/emitting so events keep
+        utterance order.
+        
+        CRITICAL: This is the ONLY place transcripts are created
+        """
+        import speech_recognition as sr
+        
+        try:
+            text = None
             try:
+                audio = sr.AudioData(audio_bytes, self.sample_rate, 2)
                 text = recognizer.recognize_google(audio, language="en-US")
-                
-                if text and len(text.strip()) > 0:
-                    # Get timestamp
-                    timestamp = time.strftime("%H:%M:%S", time.localtime())
-                    
-                    # Create transcript event
-                    event = TranscriptEvent(
-                        speaker=self.current_speaker,
-                        text=text.strip(),
-                        confidence=self.speaker_confidence,
-                        timestamp=timestamp
-                    )
-                    
-                    # Emit event
-                    if self.on_transcript_event:
-                        self.on_transcript_event(event)
-                    
-                    logger.info(f"📝 Transcript: [{event.speaker.name}] {text[:50]}...")
-                    
             except sr.UnknownValueError:
                 # Speech not understood - ignore
                 pass
             except sr.RequestError as e:
                 logger.error(f"Recognition service error: {e}")
-        
+            
+            if prev is not None:
+                prev.wait()
+            
+            if text and len(text.strip()) > 0:
+                if self.diarization:
+                    speaker, confidence = self._diarize(
+                        np.frombuffer(audio_bytes, dtype=np.int16), speaker, confidence
+                    )
+                
+                # Create transcript event
+                event = TranscriptEvent(
+                    speaker=speaker,
+                    text=text.strip(),
+                    confidence=confidence,
+                    created_at=created_at
+                )
+                
+                # Emit event
+                if self.on_transcript_event:
+                    self.on_transcript_event(event)
+                
+                logger.info(f"📝 Transcript: [{event.speaker.name}] {text[:50]}...")
+                
         except Exception as e:
-            logger.error(f"Finalization error: {e}")
+            logger.error(f"Recognition error: {e}")
         
         finally:
-            # Reset buffer
-            self.speech_frames = []
-            self.silence_frames = 0
+            done.set()
+    
+    def _load_embedder(self):
+        """Lazily load the speaker embedding model (None if unavailable)"""
+        if self._embedder is None and not self._embedder_failed:
+            try:
+                import torch
+                from pyannote.audio import Model
+                
+                self._embed_device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+                self._embedder = Model.from_pretrained(self.EMBEDDING_MODEL).to(self._embed_device).eval()
+                logger.info(f"Speaker embedding model loaded on {self._embed_device}")
+            except Exception as e:
+                logger.warning(f"Speaker embeddings unavailable, using energy heuristic: {e}")
+                self._embedder_failed = True
+        return self._embedder
+    
+    def _embed_utterance(self, samples: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Unit-norm speaker embedding for one utterance
+        
+        The utterance is cut into 1 s windows which are embedded in batches
+        of EMBEDDING_BATCH_SIZE and averaged.
+        """
+        embedder = self._load_embedder()
+        if embedder is None:
+            return None
+        
+        import torch
+        
+        win = int(self.sample_rate * self.EMBEDDING_WINDOW_S)
+        n = len(samples) // win
+        if n == 0:
+            windows = samples.reshape(1, 1, -1)  # Shorter than a window - embed as-is
+        else:
+            windows = samples[:n * win].reshape(n, 1, win)
+        windows = windows.astype(np.float32) / 32768.0
+        
+        embeddings = []
+        with torch.inference_mode():
+            for i in range(0, len(windows), self.EMBEDDING_BATCH_SIZE):
+                batch = torch.from_numpy(windows[i:i + self.EMBEDDING_BATCH_SIZE]).to(self._embed_device)
+                # .cpu() waits for the device, so no explicit synchronize is needed
+                embeddings.append(embedder(batch).cpu().numpy())
+        
+        emb = np.concatenate(embeddings).mean(axis=0)
+        norm = np.linalg.norm(emb)
+        return emb / norm if norm > 0 else None
+    
+    def _diarize(self, samples: np.ndarray, speaker: Speaker, confidence: float) -> Tuple[Speaker, float]:
+        """
+        Speaker Attribution from embeddings
+        
+        Matches the utterance against rolling INTERVIEWER/USER centroids by
+        cosine similarity. The first utterance seeds the label the energy
+        heuristic picked; a poor match to the only known voice seeds the other.
+        Returns the heuristic (speaker, confidence) if no embedding is available.
+        """
+        try:
+            emb = self._embed_utterance(samples)
+        except Exception as e:
+            logger.error(f"Speaker embedding error: {e}")
+            return speaker, confidence
+        if emb is None:
+            return speaker, confidence
+        
+        if self._centroids:
+            sims = {spk: float(c @ emb) for spk, c in self._centroids.items()}
+            best = max(sims, key=sims.get)
+            if sims[best] >= self.SPEAKER_MATCH_THRESHOLD or len(sims) == 2:
+                speaker, confidence = best, max(0.0, sims[best])
+            else:
+                speaker = Speaker.USER if best == Speaker.INTERVIEWER else Speaker.INTERVIEWER
+        
+        # Update the rolling centroid for the chosen speaker
+        c = self._centroids.get(speaker)
+        c = emb if c is None else 0.9 * c + 0.1 * emb
+        self._centroids[speaker] = c / np.linalg.norm(c)
+        
+        return speaker, confidence
     
     def resolve_overlap(self, speakers: list) -> Speaker:
         """
@@ -3,16 +3,84 @@ Context Buffer - Manages rolling context from multiple sources
 Handles screen OCR, audio transcript, and conversation history.
 """
 import logging
+import re
 import threading
+import time
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
-from datetime import datetime
 from collections import deque
-import hashlib
+from itertools import islice
+from functools import cached_property, lru_cache
 import json
+import numpy as np
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 logger = logging.getLogger(__name__)
 
+# Section headers for get_merged_context
+_SCREEN_HEADER = "[SCREEN CONTENT - CURRENT]\n"
+_AUDIO_HEADER = "[RECENT CONVERSATION]\n"
+_QA_HEADER = "[PREVIOUS Q&A]\n"
+_RESUME_HEADER = "[CANDIDATE BACKGROUND]\n"
+_SEPARATOR = "\n\n"
+_TRUNCATED = "\n[...truncated]"
+
+
+@lru_cache(maxsize=128)
+def _hash32(text: str) -> int:
+    """Fast non-cryptographic 32-bit content hash used for deduplication."""
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(text) & 0xFFFFFFFF
+    return hash(text) & 0xFFFFFFFF
+
+
+def _bigram_hashes(text: str) -> np.ndarray:
+    """Sorted, unique keys of the character bigrams in text (both code points packed)."""
+    cp = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    return np.unique((cp[:-1] << 21) | cp[1:])  # Code points fit in 21 bits
+
+
+def _bigram_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard similarity of two sorted, unique bigram key arrays."""
+    if len(a) == 0 or len(b) == 0:
+        return 0.0
+    inter = len(np.intersect1d(a, b, assume_unique=True))
+    return inter / (len(a) + len(b) - inter)
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _bigram_jaccard(a, b):
+        # Merge-style intersection of the two sorted arrays
+        na, nb = len(a), len(b)
+        if na == 0 or nb == 0:
+            return 0.0
+        i = j = inter = 0
+        while i < na and j < nb:
+            if a[i] == b[j]:
+                inter += 1
+                i += 1
+                j += 1
+            elif a[i] < b[j]:
+                i += 1
+            else:
+                j += 1
+        return inter / (na + nb - inter)
+
 
 @dataclass
 class ContextEntry:
@@ -22,11 +90,17 @@ class ContextEntry:
     timestamp: float
     priority: float = 1.0
     metadata: Dict = field(default_factory=dict)
-    content_hash: str = ""
+    content_hash: Optional[int] = None  # Callers that already hashed pass it in
+    bigrams: Optional[np.ndarray] = field(default=None, repr=False, compare=False)  # Fuzzy dedup (screen)
     
     def __post_init__(self):
-        if not self.content_hash:
-            self.content_hash = hashlib.md5(self.content.encode()).hexdigest()[:8]
+        if self.content_hash is None:
+            self.content_hash = _hash32(self.content)
+    
+    @cached_property
+    def content_lower(self) -> str:
+        """Lowercased content, computed once for keyword matching."""
+        return self.content.lower()
 
 
 class ContextBuffer:
@@ -77,8 +151,18 @@ class ContextBuffer:
         self.lock = threading.Lock()
         
         # Track last seen content for deduplication
-        self._last_screen_hash = ""
-        self._last_audio_hash = ""
+        self._last_screen_hash = 0
+        self._last_audio_hash = 0
+        
+        # Rendered tails for get_merged_context; reset to None on append
+        self._screen_tail_cache: Optional[str] = None
+        self._audio_tail_cache: Optional[str] = None
+        self._qa_tail_cache: Optional[str] = None
+        
+        # Running content lengths per buffer (kept in step with deque evictions)
+        self._chars_screen = 0
+        self._chars_audio = 0
+        self._chars_qa = 0
         
         logger.info("Context buffer initialized")
     
@@ -88,23 +172,41 @@ class ContextBuffer:
             return
         
         # Skip if same as last screen
-        content_hash = hashlib.md5(text.encode()).hexdigest()[:8]
+        content_hash = _hash32(text)
         if content_hash == self._last_screen_hash:
             return
         
         self._last_screen_hash = content_hash
         
+        content = text.strip()
         entry = ContextEntry(
             source="screen",
-            content=text.strip(),
-            timestamp=datetime.now().timestamp(),
+            content=content,
+            timestamp=time.time(),
             priority=self.PRIORITY["screen"],
             metadata=metadata or {},
-            content_hash=content_hash
+            content_hash=content_hash,
+            bigrams=_bigram_hashes(content)
         )
         
         with self.lock:
+            # A near-duplicate of one of the last few captures (OCR jitter,
+            # a small edit) replaces the most similar one, so the newest text wins
+            best_sim, best_idx = self.dedup_threshold, None
+            last = len(self.screen_buffer) - 1
+            for k, prev in enumerate(islice(reversed(self.screen_buffer), 3)):
+                sim = _bigram_jaccard(entry.bigrams, prev.bigrams)
+                if sim > best_sim:
+                    best_sim, best_idx = sim, last - k
+            if best_idx is not None:
+                self._chars_screen -= len(self.screen_buffer[best_idx].content)
+                del self.screen_buffer[best_idx]
+                logger.debug("Replaced near-duplicate screen context")
+            elif len(self.screen_buffer) == self.screen_buffer.maxlen:
+                self._chars_screen -= len(self.screen_buffer[0].content)
             self.screen_buffer.append(entry)
+            self._chars_screen += len(entry.content)
+            self._screen_tail_cache = None
         
         logger.debug(f"Added screen context: {len(text)} chars")
     
@@ -114,7 +216,7 @@ class ContextBuffer:
             return
         
         # Skip duplicates
-        content_hash = hashlib.md5(text.encode()).hexdigest()[:8]
+        content_hash = _hash32(text)
         if content_hash == self._last_audio_hash:
             return
         
@@ -123,14 +225,18 @@ class ContextBuffer:
         entry = ContextEntry(
             source="audio",
             content=text.strip(),
-            timestamp=datetime.now().timestamp(),
+            timestamp=time.time(),
             priority=self.PRIORITY["audio"],
             metadata={"speaker": speaker},
             content_hash=content_hash
         )
         
         with self.lock:
+            if len(self.audio_buffer) == self.audio_buffer.maxlen:
+                self._chars_audio -= len(self.audio_buffer[0].content)
             self.audio_buffer.append(entry)
+            self._chars_audio += len(entry.content)
+            self._audio_tail_cache = None
         
         logger.debug(f"Added audio context: {len(text)} chars")
     
@@ -139,13 +245,17 @@ class ContextBuffer:
         entry = ContextEntry(
             source="qa",
             content=f"Q: {question}\nA: {answer}",
-            timestamp=datetime.now().timestamp(),
+            timestamp=time.time(),
             priority=self.PRIORITY["qa"],
             metadata={"question": question, "answer": answer}
         )
         
         with self.lock:
+            if len(self.qa_buffer) == self.qa_buffer.maxlen:
+                self._chars_qa -= len(self.qa_buffer[0].content)
             self.qa_buffer.append(entry)
+            self._chars_qa += len(entry.content)
+            self._qa_tail_cache = None
         
         logger.debug("Added Q&A pair to context")
     
@@ -167,38 +277,39 @@ class ContextBuffer:
         max_tokens = max_tokens or self.TOKEN_LIMITS["total"]
         
         with self.lock:
-            parts = []
-            
-            # Screen context (highest priority) - SCREEN WINS
-            screen_text = self._get_recent_screen()
-            if screen_text:
-                parts.append(f"[SCREEN CONTENT - CURRENT]\n{screen_text}")
-            
-            # Audio context
-            audio_text = self._get_recent_audio()
-            if audio_text:
-                parts.append(f"[RECENT CONVERSATION]\n{audio_text}")
-            
-            # Q&A history
-            qa_text = self._get_qa_history()
-            if qa_text:
-                parts.append(f"[PREVIOUS Q&A]\n{qa_text}")
-            
-            # Resume context
-            if self.resume_context:
-                parts.append(f"[CANDIDATE BACKGROUND]\n{self.resume_context}")
-        
-        merged = "\n\n".join(parts)
+            sections = (
+                # Screen context (highest priority) - SCREEN WINS
+                (_SCREEN_HEADER, self._get_recent_screen()),
+                # Audio context
+                (_AUDIO_HEADER, self._get_recent_audio()),
+                # Q&A history
+                (_QA_HEADER, self._get_qa_history()),
+                # Resume context
+                (_RESUME_HEADER, self.resume_context),
+            )
         
-        # Truncate if needed
+        # Assemble up to the limit; truncate the section that overflows
         char_limit = max_tokens * 4  # Approximate 4 chars per token
-        if len(merged) > char_limit:
-            merged = merged[:char_limit] + "\n[...truncated]"
-        
-        return merged
+        out = []
+        total_len = 0
+        for header, text in sections:
+            if not text:
+                continue
+            for piece in ((_SEPARATOR, header, text) if out else (header, text)):
+                remaining = char_limit - total_len
+                if len(piece) > remaining:
+                    out.append(piece[:remaining])
+                    out.append(_TRUNCATED)
+                    return "".join(out)
+                out.append(piece)
+                total_len += len(piece)
+        
+        return "".join(out)
     
     def _get_recent_screen(self) -> str:
         """Get recent screen content, deduplicated."""
+        if self._screen_tail_cache is not None:
+            return self._screen_tail_cache
         if not self.screen_buffer:
             return ""
         
@@ -213,53 +324,68 @@ class ContextBuffer:
             if len(texts) >= 3:  # Max 3 recent screen captures
                 break
         
-        return "\n---\n".join(reversed(texts))
+        self._screen_tail_cache = "\n---\n".join(reversed(texts))
+        return self._screen_tail_cache
     
     def _get_recent_audio(self) -> str:
         """Get recent audio transcript."""
+        if self._audio_tail_cache is not None:
+            return self._audio_tail_cache
         if not self.audio_buffer:
             return ""
         
-        # Get last N entries
-        recent = list(self.audio_buffer)[-5:]
-        return " ".join(e.content for e in recent)
+        # Get last N entries (walk from the tail - O(k), no full list copy)
+        recent = list(islice(reversed(self.audio_buffer), 5))
+        self._audio_tail_cache = " ".join(e.content for e in reversed(recent))
+        return self._audio_tail_cache
     
     def _get_qa_history(self) -> str:
         """Get Q&A history."""
+        if self._qa_tail_cache is not None:
+            return self._qa_tail_cache
         if not self.qa_buffer:
             return ""
         
-        recent = list(self.qa_buffer)[-3:]
-        return "\n\n".join(e.content for e in recent)
+        recent = list(islice(reversed(self.qa_buffer), 3))
+        self._qa_tail_cache = "\n\n".join(e.content for e in reversed(recent))
+        return self._qa_tail_cache
     
     def get_screen_for_conflict_check(self) -> str:
         """Get latest screen content for conflict resolution."""
         if self.screen_buffer:
-            return list(self.screen_buffer)[-1].content
+            return self.screen_buffer[-1].content
         return ""
     
+    def get_screen_entry_for_conflict_check(self) -> Optional[ContextEntry]:
+        """Get latest screen entry (content plus cached content_lower)."""
+        if self.screen_buffer:
+            return self.screen_buffer[-1]
+        return None
+    
     def clear(self):
         """Clear all buffers."""
         with self.lock:
             self.screen_buffer.clear()
             self.audio_buffer.clear()
             self.qa_buffer.clear()
+            self._screen_tail_cache = self._audio_tail_cache = self._qa_tail_cache = None
+            self._chars_screen = self._chars_audio = self._chars_qa = 0
         logger.info("Context buffer cleared")
     
     def get_stats(self) -> Dict:
         """Get buffer statistics."""
-        return {
-            "screen_entries": len(self.screen_buffer),
-            "audio_entries": len(self.audio_buffer),
-            "qa_entries": len(self.qa_buffer),
-            "has_resume": bool(self.resume_context),
-            "total_chars": (
-                sum(len(e.content) for e in self.screen_buffer) +
-                sum(len(e.content) for e in self.audio_buffer) +
-                sum(len(e.content) for e in self.qa_buffer) +
-                len(self.resume_context)
-            )
-        }
+        # Counters span several fields - read them as one consistent snapshot
+        with self.lock:
+            return {
+                "screen_entries": len(self.screen_buffer),
+                "audio_entries": len(self.audio_buffer),
+                "qa_entries": len(self.qa_buffer),
+                "has_resume": bool(self.resume_context),
+                "total_chars": (
+                    self._chars_screen + self._chars_audio + self._chars_qa +
+                    len(self.resume_context)
+                )
+            }
 
 
 class ConflictResolver:
@@ -268,15 +394,58 @@ class ConflictResolver:
     Rule: Screen content wins over audio when they contradict.
     """
     
+    # Keywords that indicate specific content
+    SPECIFIC_KEYWORDS = (
+        "sort", "search", "tree", "graph", "array", "list",
+        "binary", "merge", "quick", "heap", "stack", "queue",
+        "linked", "hash", "dynamic", "greedy"
+    )
+    
+    # Words that suggest the screen shows a coding problem
+    PROBLEM_INDICATORS = (
+        "implement", "write", "create", "design", "build",
+        "given", "input", "output", "example", "constraint"
+    )
+    
+    # Regex fallback; the lookahead keeps substring semantics (overlaps included)
+    _SPECIFIC_RE = re.compile("(?=(" + "|".join(SPECIFIC_KEYWORDS) + "))")
+    _PROBLEM_RE = re.compile("(?=(" + "|".join(PROBLEM_INDICATORS) + "))")
+    
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def keyword_hits(text_lower: str) -> Tuple[frozenset, frozenset]:
+        """
+        (specific keywords, problem indicators) found in lowercased text.
+        
+        Both sets come from a single Aho-Corasick pass when pyahocorasick is
+        installed; cached so resolve() and extract_problem_from_screen() on
+        the same screen text share the scan.
+        """
+        if _KEYWORD_AUTOMATON is not None:
+            specific, problem = set(), set()
+            for _, (category, kw) in _KEYWORD_AUTOMATON.iter(text_lower):
+                (specific if category == "specific" else problem).add(kw)
+            return frozenset(specific), frozenset(problem)
+        return (
+            frozenset(ConflictResolver._SPECIFIC_RE.findall(text_lower)),
+            frozenset(ConflictResolver._PROBLEM_RE.findall(text_lower))
+        )
+    
     @staticmethod
     def resolve(
         screen_context: str,
         audio_context: str,
-        question: str
+        question: str,
+        screen_lower: Optional[str] = None,
+        audio_lower: Optional[str] = None
     ) -> Tuple[str, str]:
         """
         Resolve conflicts between screen and audio context.
         
+        Args:
+            screen_lower / audio_lower: Pre-lowercased forms (e.g.
+                ContextEntry.content_lower) to skip re-lowercasing
+        
         Returns:
             (primary_context, conflict_note)
         """
@@ -288,18 +457,13 @@ class ConflictResolver:
         
         # Check for potential conflicts
         # If screen shows code/problem and audio mentions different problem
-        screen_lower = screen_context.lower()
-        audio_lower = audio_context.lower()
-        
-        # Keywords that indicate specific content
-        specific_keywords = [
-            "sort", "search", "tree", "graph", "array", "list",
-            "binary", "merge", "quick", "heap", "stack", "queue",
-            "linked", "hash", "dynamic", "greedy"
-        ]
+        if screen_lower is None:
+            screen_lower = screen_context.lower()
+        if audio_lower is None:
+            audio_lower = audio_context.lower()
         
-        screen_keywords = set(kw for kw in specific_keywords if kw in screen_lower)
-        audio_keywords = set(kw for kw in specific_keywords if kw in audio_lower)
+        screen_keywords = ConflictResolver.keyword_hits(screen_lower)[0]
+        audio_keywords = ConflictResolver.keyword_hits(audio_lower)[0]
         
         if screen_keywords and audio_keywords:
             # Both have specific content
@@ -319,16 +483,10 @@ class ConflictResolver:
         if not screen_text:
             return None
         
-        # Look for common problem patterns
-        problem_indicators = [
-            "implement", "write", "create", "design", "build",
-            "given", "input", "output", "example", "constraint"
-        ]
-        
         text_lower = screen_text.lower()
         
-        # Check if this looks like a problem
-        indicator_count = sum(1 for ind in problem_indicators if ind in text_lower)
+        # Check if this looks like a problem (distinct indicators present)
+        indicator_count = len(ConflictResolver.keyword_hits(text_lower)[1])
         
         if indicator_count >= 2:
             return {
@@ -338,3 +496,19 @@ class ConflictResolver:
             }
         
         return None
+
+
+def _build_keyword_automaton():
+    """One Aho-Corasick automaton over both ConflictResolver keyword sets."""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for kw in ConflictResolver.SPECIFIC_KEYWORDS:
+        automaton.add_word(kw, ("specific", kw))
+    for kw in ConflictResolver.PROBLEM_INDICATORS:
+        automaton.add_word(kw, ("problem", kw))
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
@@ -3,15 +3,31 @@ OCR Processor - GPU-accelerated text extraction from screen captures
 Supports Tesseract and PaddleOCR for high-accuracy text recognition.
 """
 import logging
-import threading
 import queue
-from typing import Optional, List, Dict, Tuple
+import re
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Optional, List, Dict, Tuple, Union
 from dataclasses import dataclass
 from PIL import Image
+import numpy as np
 import time
 
 logger = logging.getLogger(__name__)
 
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+try:
+    import multiprocessing as mp
+    from multiprocessing import shared_memory
+except ImportError:
+    mp = None
+    shared_memory = None
+
 # Try to import OCR engines
 OCR_ENGINE = None
 
@@ -53,11 +69,18 @@ class OCRProcessor:
     Automatically detects and uses best available engine.
     """
     
+    # PaddleOCR/EasyOCR inputs are downscaled so the longest side is at most this
+    MAX_OCR_SIDE = 1600
+    
+    # Frames whose subsampled pixel std-dev is below this have no readable text
+    MIN_OCR_STD = 5.0
+    
     def __init__(
         self,
         engine: Optional[str] = None,
         language: str = "en",
-        gpu: bool = True
+        gpu: bool = True,
+        use_process: bool = False
     ):
         """
         Initialize OCR processor.
@@ -66,21 +89,41 @@ class OCRProcessor:
             engine: OCR engine ('tesseract', 'paddle', 'easyocr', or None for auto)
             language: Language code
             gpu: Use GPU acceleration if available
+            use_process: Run OCR in a child process (frames passed via shared memory)
         """
         self.engine_name = engine or OCR_ENGINE
         self.language = language
         self.use_gpu = gpu
         
+        if use_process and shared_memory is None:
+            logger.warning("multiprocessing.shared_memory unavailable, running OCR in-process")
+            use_process = False
+        self.use_process = use_process
+        
+        # Child-process worker state (engine is loaded in the child, not here)
+        self._worker = None
+        self._jobs = None
+        self._results = None
+        self._shm = None
+        self._remote_lock = threading.Lock()
+        
         self.engine = None
-        self._init_engine()
+        if not self.use_process:
+            self._init_engine()
         
-        # Processing queue
-        self.input_queue: queue.Queue = queue.Queue(maxsize=5)
-        self.output_queue: queue.Queue = queue.Queue(maxsize=10)
+        # Processing buffers: deque(maxlen) drops the oldest item on overflow
+        self._in_buf: deque = deque(maxlen=5)
+        self._in_cv = threading.Condition()
+        self._out_buf: deque = deque(maxlen=10)
+        self._out_cv = threading.Condition()
         
         self.running = False
         self.process_thread: Optional[threading.Thread] = None
         
+        # Background batching: drain up to batch_size queued frames within batch_wait
+        self.batch_size = 8
+        self.batch_wait = 0.05
+        
         logger.info(f"OCR initialized with {self.engine_name}, GPU={gpu}")
     
     def _init_engine(self):
@@ -117,17 +160,48 @@ class OCRProcessor:
                 use_gpu=self.use_gpu,
                 show_log=False
             )
+            self._check_gpu_engaged()
             
         elif self.engine_name == "easyocr":
             import easyocr
             self.engine = easyocr.Reader(
                 ['en'],
                 gpu=self.use_gpu,
+                cudnn_benchmark=self.use_gpu,  # Autotune convs once; inputs are size-capped
                 verbose=False
             )
+            self._check_gpu_engaged()
+            if self.use_gpu:
+                # Warm up at a downscaled 16:9 capture size so the first real frame is fast
+                side = self.MAX_OCR_SIDE
+                self.engine.readtext(np.zeros((side * 9 // 16, side, 3), dtype=np.uint8))
         else:
             raise RuntimeError(f"Unknown OCR engine: {self.engine_name}")
     
+    def _active_device(self) -> Optional[str]:
+        """Device the loaded engine actually runs on ('gpu'/'cpu'), None if unknown."""
+        if self.engine_name == "paddle":
+            # PaddleOCR resets args.use_gpu when paddle lacks CUDA support
+            args = getattr(self.engine, "args", None)
+            if args is not None and hasattr(args, "use_gpu"):
+                return "gpu" if args.use_gpu else "cpu"
+        elif self.engine_name == "easyocr":
+            device = str(getattr(self.engine, "device", ""))
+            if device:
+                return "gpu" if device.startswith("cuda") else "cpu"
+        return None
+    
+    def _check_gpu_engaged(self):
+        """Warn when GPU was requested but the engine silently fell back to CPU."""
+        if not self.use_gpu:
+            return
+        if self._active_device() == "cpu":
+            logger.warning(
+                f"{self.engine_name} was asked to use the GPU but is running on CPU; "
+                "check the CUDA build of paddle/torch"
+            )
+            self.use_gpu = False  # Skip GPU-only warm-up
+    
     def start(self):
         """Start background OCR processing."""
         self.running = True
@@ -140,14 +214,68 @@ class OCRProcessor:
         self.running = False
         if self.process_thread:
             self.process_thread.join(timeout=2)
+        self._stop_worker()
         logger.info("OCR processor stopped")
     
-    def process_image(self, image: Image.Image, frame_id: int = 0) -> OCRResult:
+    def _start_worker(self):
+        """Spawn the OCR child process if it is not running."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        ctx = mp.get_context("spawn")  # CUDA must be initialised in the child
+        self._jobs = ctx.Queue()
+        self._results = ctx.Queue()
+        self._worker = ctx.Process(
+            target=_ocr_worker_main,
+            args=(self.engine_name, self.language, self.use_gpu, self._jobs, self._results),
+            daemon=True
+        )
+        self._worker.start()
+        logger.info(f"OCR worker process started (pid {self._worker.pid})")
+    
+    def _stop_worker(self):
+        """Shut down the OCR child process and free the shared frame buffer."""
+        with self._remote_lock:
+            if self._worker is not None:
+                self._jobs.put(None)
+                self._worker.join(timeout=5)
+                if self._worker.is_alive():
+                    self._worker.terminate()
+                self._worker = None
+            self._release_shm()
+    
+    def _release_shm(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+    
+    def _process_remote(self, image: Union[Image.Image, np.ndarray], frame_id: int) -> OCRResult:
+        """OCR one frame in the child process; the pixels travel via shared memory."""
+        arr = image if isinstance(image, np.ndarray) else np.asarray(image)
+        
+        with self._remote_lock:
+            self._start_worker()
+            
+            # Grow the shared buffer when a larger frame arrives
+            if self._shm is None or self._shm.size < arr.nbytes:
+                self._release_shm()
+                self._shm = shared_memory.SharedMemory(create=True, size=arr.nbytes)
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=self._shm.buf)[...] = arr
+            
+            self._jobs.put((self._shm.name, arr.shape, arr.dtype.str, frame_id))
+            while True:
+                try:
+                    return self._results.get(timeout=1.0)
+                except queue.Empty:
+                    if not self._worker.is_alive():
+                        raise RuntimeError("OCR worker process exited")
+    
+    def process_image(self, image: Union[Image.Image, np.ndarray], frame_id: int = 0) -> OCRResult:
         """
         Process a single image synchronously.
         
         Args:
-            image: PIL Image to process
+            image: PIL Image, or BGR(A) ndarray as produced by ScreenCapture
             frame_id: Optional frame identifier
             
         Returns:
@@ -155,6 +283,12 @@ class OCRProcessor:
         """
         start_time = time.time()
         
+        if self._is_blank(image):
+            return OCRResult("", 0.0, [], time.time(), frame_id, time.time() - start_time)
+        
+        if self.use_process:
+            return self._process_remote(image, frame_id)
+        
         if self.engine_name == "tesseract":
             result = self._process_tesseract(image)
         elif self.engine_name == "paddle":
@@ -175,35 +309,84 @@ class OCRProcessor:
             processing_time=processing_time
         )
     
-    def _process_tesseract(self, image: Image.Image) -> Dict:
-        """Process with Tesseract."""
-        import pytesseract
-        
-        # Get detailed data
-        data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-        
-        regions = []
-        full_text = []
-        confidences = []
-        
-        for i, text in enumerate(data['text']):
-            if text.strip():
-                conf = int(data['conf'][i]) if data['conf'][i] != '-1' else 0
-                if conf > 30:  # Filter low confidence
-                    regions.append({
-                        "text": text,
-                        "bbox": (
-                            data['left'][i],
-                            data['top'][i],
-                            data['width'][i],
-                            data['height'][i]
-                        ),
-                        "confidence": conf / 100.0
-                    })
-                    full_text.append(text)
-                    confidences.append(conf)
+    @classmethod
+    def _is_blank(cls, image: Union[Image.Image, np.ndarray]) -> bool:
+        """Cheap gate: near-uniform frames (video, lock screen, empty editor) skip OCR."""
+        if isinstance(image, np.ndarray):
+            sample = image[::16, ::16, :3] if image.ndim == 3 else image[::16, ::16]
+        else:
+            # Nearest-neighbour shrink in C rather than copying the full frame
+            w, h = image.size
+            sample = np.asarray(image.resize((max(w // 16, 1), max(h // 16, 1)), Image.Resampling.NEAREST))
+        return sample.size == 0 or float(sample.std(dtype=np.float32)) < cls.MIN_OCR_STD
+    
+    @staticmethod
+    def _as_rgb(image: Union[Image.Image, np.ndarray]) -> Union[Image.Image, np.ndarray]:
+        """RGB input for Tesseract; BGRA arrays become a channel-reversed view."""
+        if isinstance(image, np.ndarray) and image.ndim == 3:
+            return image[:, :, 2::-1]
+        return image
+    
+    @staticmethod
+    def _as_bgr(image: Union[Image.Image, np.ndarray]) -> np.ndarray:
+        """
+        Contiguous BGR uint8 array for the OpenCV-convention engines (PaddleOCR, EasyOCR).
         
-        avg_conf = sum(confidences) / len(confidences) if confidences else 0
+        Kept uint8 so the engines' own cv2 preprocessing takes its fast path;
+        nothing here promotes to float.
+        """
+        if isinstance(image, np.ndarray):
+            if image.ndim == 3 and image.shape[2] == 4:
+                return np.ascontiguousarray(image[:, :, :3])  # Drop alpha
+            return np.ascontiguousarray(image)
+        return np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1])
+    
+    @classmethod
+    def _downscale(cls, arr: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Shrink arr to MAX_OCR_SIDE (INTER_AREA); returns (array, scale applied)."""
+        h, w = arr.shape[:2]
+        scale = cls.MAX_OCR_SIDE / max(h, w)
+        if scale >= 1.0:
+            return arr, 1.0
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        if cv2 is not None:
+            return cv2.resize(arr, size, interpolation=cv2.INTER_AREA), scale
+        return np.asarray(Image.fromarray(arr).resize(size, Image.Resampling.BOX)), scale
+    
+    @staticmethod
+    def _unscale_bbox(bbox, scale: float, scale_y: Optional[float] = None):
+        """Map a polygon bbox from downscaled back to capture coordinates."""
+        scale_y = scale if scale_y is None else scale_y
+        if scale == 1.0 and scale_y == 1.0:
+            return bbox
+        return [[x / scale, y / scale_y] for x, y in bbox]
+    
+    def _process_tesseract(self, image: Union[Image.Image, np.ndarray]) -> Dict:
+        """Process with Tesseract."""
+        # Get detailed data (self.engine is the pytesseract module)
+        data = self.engine.image_to_data(self._as_rgb(image), output_type=self.engine.Output.DICT)
+        
+        texts = data['text']
+        
+        # Vectorized filter: non-empty words with confidence > 30
+        conf = np.asarray(data['conf'], dtype=np.float32).astype(np.int32)
+        mask = conf > 30
+        mask &= np.fromiter((bool(t.strip()) for t in texts), dtype=bool, count=len(texts))
+        keep = np.flatnonzero(mask).tolist()
+        
+        left, top, width, height = data['left'], data['top'], data['width'], data['height']
+        kept_conf = conf[mask]
+        regions = [
+            {
+                "text": texts[i],
+                "bbox": (left[i], top[i], width[i], height[i]),
+                "confidence": c / 100.0
+            }
+            for i, c in zip(keep, kept_conf.tolist())
+        ]
+        full_text = [texts[i] for i in keep]
+        
+        avg_conf = float(kept_conf.mean()) if keep else 0
         
         return {
             "text": " ".join(full_text),
@@ -211,12 +394,9 @@ class OCRProcessor:
             "confidence": avg_conf / 100.0
         }
     
-    def _process_paddle(self, image: Image.Image) -> Dict:
+    def _process_paddle(self, image: Union[Image.Image, np.ndarray]) -> Dict:
         """Process with PaddleOCR."""
-        import numpy as np
-        
-        # Convert to numpy array
-        img_array = np.array(image)
+        img_array, scale = self._downscale(self._as_bgr(image))
         
         # Run OCR
         result = self.engine.ocr(img_array, cls=True)
@@ -230,7 +410,7 @@ class OCRProcessor:
                 bbox, (text, conf) = line
                 regions.append({
                     "text": text,
-                    "bbox": bbox,
+                    "bbox": self._unscale_bbox(bbox, scale),
                     "confidence": conf
                 })
                 full_text.append(text)
@@ -244,13 +424,37 @@ class OCRProcessor:
             "confidence": avg_conf
         }
     
-    def _process_easyocr(self, image: Image.Image) -> Dict:
+    def _process_easyocr(self, image: Union[Image.Image, np.ndarray]) -> Dict:
         """Process with EasyOCR."""
-        import numpy as np
+        img_array, scale = self._downscale(self._as_bgr(image))
+        return self._easyocr_result(self.engine.readtext(img_array), scale, scale)
+    
+    def _process_easyocr_batch(self, images: List[Union[Image.Image, np.ndarray]]) -> List[Dict]:
+        """
+        Process several images in one EasyOCR readtext_batched call.
         
-        img_array = np.array(image)
-        result = self.engine.readtext(img_array)
+        readtext_batched needs equal sizes, so every image is resized to
+        the (downscaled) size of the first one.
+        """
+        bgr = [self._as_bgr(image) for image in images]  # One conversion per image
+        first, _ = self._downscale(bgr[0])
+        n_height, n_width = first.shape[:2]
+        
+        scales = [(n_width / arr.shape[1], n_height / arr.shape[0]) for arr in bgr]
+        arrays = [first]
+        for arr in bgr[1:]:
+            if arr.shape[:2] != (n_height, n_width):
+                if cv2 is not None:
+                    arr = cv2.resize(arr, (n_width, n_height), interpolation=cv2.INTER_AREA)
+                else:
+                    arr = np.asarray(Image.fromarray(arr).resize((n_width, n_height), Image.Resampling.BOX))
+            arrays.append(arr)
         
+        results = self.engine.readtext_batched(arrays, n_width=n_width, n_height=n_height)
+        return [self._easyocr_result(r, sx, sy) for r, (sx, sy) in zip(results, scales)]
+    
+    def _easyocr_result(self, result, scale_x: float, scale_y: float) -> Dict:
+        """Assemble EasyOCR detections into the common result dict."""
         regions = []
         full_text = []
         confidences = []
@@ -258,7 +462,7 @@ class OCRProcessor:
         for (bbox, text, conf) in result:
             regions.append({
                 "text": text,
-                "bbox": bbox,
+                "bbox": self._unscale_bbox(bbox, scale_x, scale_y),
                 "confidence": conf
             })
             full_text.append(text)
@@ -272,47 +476,113 @@ class OCRProcessor:
             "confidence": avg_conf
         }
     
-    def queue_image(self, image: Image.Image, frame_id: int = 0):
-        """Add image to processing queue."""
-        try:
-            self.input_queue.put_nowait((image, frame_id))
-        except queue.Full:
-            # Drop oldest
-            try:
-                self.input_queue.get_nowait()
-                self.input_queue.put_nowait((image, frame_id))
-            except:
-                pass
+    def queue_image(self, image: Union[Image.Image, np.ndarray], frame_id: int = 0):
+        """Add image to processing queue (drops the oldest when full)."""
+        with self._in_cv:
+            self._in_buf.append((image, frame_id))
+            self._in_cv.notify()
     
     def get_result(self, timeout: float = 0.1) -> Optional[OCRResult]:
         """Get next OCR result from queue."""
-        try:
-            return self.output_queue.get(timeout=timeout)
-        except queue.Empty:
-            return None
+        with self._out_cv:
+            if not self._out_cv.wait_for(lambda: self._out_buf, timeout=timeout):
+                return None
+            return self._out_buf.popleft()
+    
+    def _next_batch(self) -> List[Tuple[Union[Image.Image, np.ndarray], int]]:
+        """Wait for one queued frame, then gather more for up to batch_wait."""
+        with self._in_cv:
+            if not self._in_cv.wait_for(lambda: self._in_buf, timeout=0.5):
+                return []
+            batch = [self._in_buf.popleft()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                if self._in_buf:
+                    batch.append(self._in_buf.popleft())
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._in_cv.wait(remaining):
+                    break
+        return batch
+    
+    def _process_batch(self, batch) -> List[OCRResult]:
+        """OCR a batch of (image, frame_id); batched for EasyOCR, per frame otherwise."""
+        if self.use_process or self.engine_name != "easyocr" or len(batch) == 1:
+            return [self.process_image(image, frame_id) for image, frame_id in batch]
+        
+        # Blank frames get empty results without entering the batched call
+        pending = [i for i, (image, _) in enumerate(batch) if not self._is_blank(image)]
+        if len(pending) <= 1:
+            return [self.process_image(image, frame_id) for image, frame_id in batch]
+        
+        start_time = time.time()
+        results = self._process_easyocr_batch([batch[i][0] for i in pending])
+        per_frame = (time.time() - start_time) / len(pending)
+        
+        out = [OCRResult("", 0.0, [], time.time(), frame_id, 0.0) for _, frame_id in batch]
+        for i, result in zip(pending, results):
+            out[i] = OCRResult(
+                text=result["text"],
+                confidence=result["confidence"],
+                regions=result["regions"],
+                timestamp=time.time(),
+                frame_id=batch[i][1],
+                processing_time=per_frame
+            )
+        return out
     
     def _process_loop(self):
         """Background processing loop."""
         while self.running:
             try:
-                image, frame_id = self.input_queue.get(timeout=0.5)
-                result = self.process_image(image, frame_id)
+                batch = self._next_batch()
+                if not batch:
+                    continue
                 
-                try:
-                    self.output_queue.put_nowait(result)
-                except queue.Full:
-                    try:
-                        self.output_queue.get_nowait()
-                        self.output_queue.put_nowait(result)
-                    except:
-                        pass
+                results = self._process_batch(batch)
+                with self._out_cv:
+                    self._out_buf.extend(results)
+                    self._out_cv.notify_all()
                         
-            except queue.Empty:
-                continue
             except Exception as e:
                 logger.error(f"OCR processing error: {e}")
 
 
+def _ocr_worker_main(engine: str, language: str, gpu: bool, jobs, results):
+    """
+    Child-process OCR loop for OCRProcessor(use_process=True).
+    
+    Jobs are (shm_name, shape, dtype, frame_id); the frame is read as a view
+    of the shared buffer, so no pixels are pickled. None shuts the worker down.
+    """
+    ocr = OCRProcessor(engine=engine, language=language, gpu=gpu)
+    shm = None
+    
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        
+        shm_name, shape, dtype, frame_id = job
+        image = None
+        try:
+            if shm is None or shm.name != shm_name:
+                if shm is not None:
+                    shm.close()
+                shm = shared_memory.SharedMemory(name=shm_name)
+            image = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            result = ocr.process_image(image, frame_id)
+        except Exception as e:
+            logger.error(f"OCR worker error: {e}")
+            result = OCRResult("", 0.0, [], time.time(), frame_id, 0.0)
+        finally:
+            image = None  # Drop the view so the buffer can be closed
+        results.put(result)
+    
+    if shm is not None:
+        shm.close()
+
+
 class CodeDetector:
     """Detect and extract code from OCR text."""
     
@@ -329,49 +599,65 @@ class CodeDetector:
     # Syntax characters common in code
     CODE_CHARS = ["{", "}", "()", "[];", "=>", "->", "::", "//", "/*", "*/"]
     
+    # Language detection patterns
+    LANGUAGE_PATTERNS = {
+        "python": ["def ", "import ", "from ", "print(", "__init__", "self."],
+        "javascript": ["function ", "const ", "let ", "var ", "=>", "console.log"],
+        "java": ["public class", "public static", "System.out", "void main"],
+        "cpp": ["#include", "std::", "cout", "cin", "int main"],
+        "go": ["func ", "package ", "fmt.", "import ("],
+        "sql": ["select ", "from ", "where ", "insert ", "update "],
+        "html": ["<html", "<div", "<script", "</"],
+        "css": ["{", "}", "color:", "margin:", "padding:"],
+    }
+    
+    # Compiled once: case-insensitive alternations, no per-call lowercasing
+    _CODE_RE = re.compile("|".join(re.escape(p) for p in CODE_PATTERNS), re.IGNORECASE)
+    _CODE_CHARS_RE = re.compile("(?=(" + "|".join(re.escape(c) for c in CODE_CHARS) + "))")
+    _INDENT_RE = re.compile(r"^(?:    |\t)", re.MULTILINE)
+    # A code line is indented or contains one of the first five CODE_PATTERNS;
+    # a block is a maximal run of such lines
+    _CODE_LINE = (
+        r"(?:(?:    |\t)[^\n]*|[^\n]*(?:"
+        + "|".join(re.escape(p) for p in CODE_PATTERNS[:5])
+        + r")[^\n]*)$"
+    )
+    _BLOCK_RE = re.compile("^" + _CODE_LINE + r"(?:\n" + _CODE_LINE + ")*", re.MULTILINE)
+    # Lookahead so overlapping keywords are all seen (same as `kw in text`)
+    _LANG_RES = {
+        lang: re.compile("(?=(" + "|".join(re.escape(k) for k in kws) + "))", re.IGNORECASE)
+        for lang, kws in LANGUAGE_PATTERNS.items()
+    }
+    
     @classmethod
     def is_code(cls, text: str) -> bool:
         """Check if text appears to be code."""
-        text_upper = text.upper()
-        
         # Check for code patterns
-        for pattern in cls.CODE_PATTERNS:
-            if pattern.upper() in text_upper:
-                return True
-        
-        # Check for syntax characters
-        code_char_count = sum(1 for char in cls.CODE_CHARS if char in text)
-        if code_char_count >= 2:
+        if cls._CODE_RE.search(text):
             return True
         
-        # Check for indentation patterns
-        lines = text.split('\n')
-        indented_lines = sum(1 for line in lines if line.startswith('    ') or line.startswith('\t'))
-        if indented_lines >= 3:
-            return True
+        # Check for syntax characters (2 distinct ones is enough)
+        seen = set()
+        for m in cls._CODE_CHARS_RE.finditer(text):
+            seen.add(m.group(1))
+            if len(seen) >= 2:
+                return True
+        
+        # Check for indentation patterns (3 indented lines is enough)
+        for i, _ in enumerate(cls._INDENT_RE.finditer(text), 1):
+            if i >= 3:
+                return True
         
         return False
     
     @classmethod
+    @lru_cache(maxsize=1024)
     def detect_language(cls, text: str) -> str:
-        """Detect programming language from code text."""
-        text_lower = text.lower()
-        
-        # Language detection patterns
-        patterns = {
-            "python": ["def ", "import ", "from ", "print(", "__init__", "self."],
-            "javascript": ["function ", "const ", "let ", "var ", "=>", "console.log"],
-            "java": ["public class", "public static", "System.out", "void main"],
-            "cpp": ["#include", "std::", "cout", "cin", "int main"],
-            "go": ["func ", "package ", "fmt.", "import ("],
-            "sql": ["select ", "from ", "where ", "insert ", "update "],
-            "html": ["<html", "<div", "<script", "</"],
-            "css": ["{", "}", "color:", "margin:", "padding:"],
-        }
-        
+        """Detect programming language from code text (memoized; stable screens repeat blocks)."""
         scores = {}
-        for lang, keywords in patterns.items():
-            score = sum(1 for kw in keywords if kw.lower() in text_lower)
+        for lang, regex in cls._LANG_RES.items():
+            # Distinct keywords present
+            score = len({m.lower() for m in regex.findall(text)})
             if score > 0:
                 scores[lang] = score
         
@@ -381,41 +667,8 @@ class CodeDetector:
     
     @classmethod
     def extract_code_blocks(cls, text: str) -> List[Dict]:
-        """Extract code blocks from text."""
-        blocks = []
-        lines = text.split('\n')
-        
-        current_block = []
-        in_code = False
-        
-        for line in lines:
-            is_code_line = (
-                line.startswith('    ') or
-                line.startswith('\t') or
-                any(p in line for p in cls.CODE_PATTERNS[:5])
-            )
-            
-            if is_code_line:
-                if not in_code:
-                    in_code = True
-                    current_block = []
-                current_block.append(line)
-            else:
-                if in_code and current_block:
-                    code_text = '\n'.join(current_block)
-                    blocks.append({
-                        "code": code_text,
-                        "language": cls.detect_language(code_text)
-                    })
-                    current_block = []
-                in_code = False
-        
-        # Don't forget last block
-        if current_block:
-            code_text = '\n'.join(current_block)
-            blocks.append({
-                "code": code_text,
-                "language": cls.detect_language(code_text)
-            })
-        
-        return blocks
+        """Extract code blocks (runs of consecutive code lines) from text."""
+        return [
+            {"code": m.group(0), "language": cls.detect_language(m.group(0))}
+            for m in cls._BLOCK_RE.finditer(text)
+        ]
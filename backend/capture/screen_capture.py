@@ -4,15 +4,26 @@ Captures entire screen at configurable FPS for real-time context detection.
 """
 import logging
 import threading
-import queue
+from collections import deque
 import time
-from typing import Optional, Callable, Tuple, List
+from typing import Optional, Callable, Tuple, List, Union
 from dataclasses import dataclass
 from PIL import Image
+import numpy as np
 import io
 
 logger = logging.getLogger(__name__)
 
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
 # Try to import mss (preferred) or fall back to pyautogui
 try:
     import mss
@@ -38,11 +49,24 @@ class CaptureRegion:
 
 @dataclass  
 class ScreenFrame:
-    """A captured screen frame with metadata."""
-    image: Image.Image
+    """
+    A captured screen frame with metadata.
+    
+    image is either a PIL Image (pyautogui) or the raw H x W x 4 BGRA
+    ndarray from mss; use to_pil() when a PIL Image is actually needed.
+    """
+    image: Union[Image.Image, np.ndarray]
     timestamp: float
     region: CaptureRegion
     frame_id: int
+    
+    def to_pil(self) -> Image.Image:
+        """Return the frame as an RGB PIL Image (converted on demand)."""
+        if isinstance(self.image, np.ndarray):
+            h, w = self.image.shape[:2]
+            # PIL's raw decoder reorders BGRX -> RGB in C
+            return Image.frombuffer("RGB", (w, h), self.image, "raw", "BGRX", 0, 1)
+        return self.image
 
 
 class ScreenCapture:
@@ -70,7 +94,9 @@ class ScreenCapture:
         self.region = region or CaptureRegion()
         self.max_queue_size = max_queue_size
         
-        self.frame_queue: queue.Queue[ScreenFrame] = queue.Queue(maxsize=max_queue_size)
+        # Ring buffer: deque(maxlen) drops the oldest frame on overflow
+        self._frames: deque = deque(maxlen=max_queue_size)
+        self._frames_lock = threading.Lock()
         self.running = False
         self.paused = False
         self.capture_thread: Optional[threading.Thread] = None
@@ -79,6 +105,13 @@ class ScreenCapture:
         # Privacy filters
         self.excluded_regions: List[Tuple[int, int, int, int]] = []  # (x, y, w, h)
         
+        # Signature of the last emitted frame (skip OCR on unchanged screens)
+        self._last_signature: Optional[int] = None
+        
+        # Per-thread mss handle for capture_frame (mss objects are not thread-safe)
+        # and encode buffer for get_frame_bytes
+        self._tls = threading.local()
+        
         # Callbacks
         self.on_frame: Optional[Callable[[ScreenFrame], None]] = None
         
@@ -147,27 +180,24 @@ class ScreenCapture:
             else:
                 capture_area = monitor
             
+            deadline = time.monotonic()
             while self.running:
                 if self.paused:
                     time.sleep(0.1)
+                    deadline = time.monotonic()
                     continue
                 
-                start_time = time.time()
-                
                 try:
-                    # Capture screen
-                    screenshot = sct.grab(capture_area)
-                    
-                    # Convert to PIL Image
-                    img = Image.frombytes(
-                        "RGB",
-                        (screenshot.width, screenshot.height),
-                        screenshot.rgb
-                    )
+                    # Capture screen (BGRA view, no RGB conversion)
+                    img = self._grab_bgra(sct, capture_area)
                     
                     # Apply privacy filters
                     img = self._apply_privacy_filters(img)
                     
+                    # Skip visually identical frames
+                    if not self._is_changed(img):
+                        continue
+                    
                     # Create frame
                     self.frame_counter += 1
                     frame = ScreenFrame(
@@ -177,16 +207,9 @@ class ScreenCapture:
                         frame_id=self.frame_counter
                     )
                     
-                    # Add to queue (non-blocking)
-                    try:
-                        self.frame_queue.put_nowait(frame)
-                    except queue.Full:
-                        # Drop oldest frame
-                        try:
-                            self.frame_queue.get_nowait()
-                            self.frame_queue.put_nowait(frame)
-                        except:
-                            pass
+                    # Add to ring buffer (oldest frame drops out)
+                    with self._frames_lock:
+                        self._frames.append(frame)
                     
                     # Call callback
                     if self.on_frame:
@@ -195,22 +218,21 @@ class ScreenCapture:
                 except Exception as e:
                     logger.error(f"Capture error: {e}")
                 
-                # Maintain FPS
-                elapsed = time.time() - start_time
-                sleep_time = max(0, self.interval - elapsed)
-                time.sleep(sleep_time)
+                finally:
+                    # Maintain FPS (also after skipped frames)
+                    deadline = self._sleep_until_next(deadline)
     
     def _capture_loop_pyautogui(self):
         """Capture using pyautogui (fallback)."""
         import pyautogui
         
+        deadline = time.monotonic()
         while self.running:
             if self.paused:
                 time.sleep(0.1)
+                deadline = time.monotonic()
                 continue
             
-            start_time = time.time()
-            
             try:
                 # Capture screen
                 if self.region.width > 0 and self.region.height > 0:
@@ -237,15 +259,9 @@ class ScreenCapture:
                     frame_id=self.frame_counter
                 )
                 
-                # Add to queue
-                try:
-                    self.frame_queue.put_nowait(frame)
-                except queue.Full:
-                    try:
-                        self.frame_queue.get_nowait()
-                        self.frame_queue.put_nowait(frame)
-                    except:
-                        pass
+                # Add to ring buffer
+                with self._frames_lock:
+                    self._frames.append(frame)
                 
                 if self.on_frame:
                     self.on_frame(frame)
@@ -253,56 +269,106 @@ class ScreenCapture:
             except Exception as e:
                 logger.error(f"Capture error: {e}")
             
-            elapsed = time.time() - start_time
-            sleep_time = max(0, self.interval - elapsed)
-            time.sleep(sleep_time)
+            deadline = self._sleep_until_next(deadline)
+    
+    def _sleep_until_next(self, deadline: float) -> float:
+        """
+        Sleep until the next frame slot and return its deadline.
+        
+        Slots are spaced on a fixed monotonic grid so sleep overshoot does not
+        accumulate; if we fall more than one interval behind, resync to now.
+        """
+        deadline += self.interval
+        now = time.monotonic()
+        if now - deadline > self.interval:
+            return now
+        time.sleep(max(0.0, deadline - now))
+        return deadline
+    
+    @staticmethod
+    def _frame_signature(img: Union[Image.Image, np.ndarray]) -> int:
+        """Cheap hash of a 32x-downsampled grayscale copy of the frame."""
+        if not isinstance(img, np.ndarray):
+            img = np.asarray(img)
+        # Integer channel mean (== float mean truncated), no float64 temporary
+        small = (img[::32, ::32, :3].sum(axis=2, dtype=np.uint16) // 3).astype(np.uint8).tobytes()
+        if xxhash is not None:
+            return xxhash.xxh64_intdigest(small)
+        return hash(small)
     
-    def _apply_privacy_filters(self, img: Image.Image) -> Image.Image:
+    def _is_changed(self, img: Union[Image.Image, np.ndarray]) -> bool:
+        """True if img differs from the last emitted frame (and remember it)."""
+        signature = self._frame_signature(img)
+        if signature == self._last_signature:
+            return False
+        self._last_signature = signature
+        return True
+    
+    @staticmethod
+    def _grab_bgra(sct, capture_area) -> np.ndarray:
+        """Grab with mss and view the pixels as an H x W x 4 BGRA array."""
+        screenshot = sct.grab(capture_area)
+        # .raw is a bytearray, so the view is writable (privacy filters) without a copy
+        return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(
+            screenshot.height, screenshot.width, 4
+        )
+    
+    def _apply_privacy_filters(self, img: Union[Image.Image, np.ndarray]) -> Union[Image.Image, np.ndarray]:
         """Apply privacy filters by blacking out excluded regions."""
         if not self.excluded_regions:
             return img
         
-        from PIL import ImageDraw
+        if isinstance(img, np.ndarray):
+            for (x, y, w, h) in self.excluded_regions:
+                img[max(y, 0):max(y + h + 1, 0), max(x, 0):max(x + w + 1, 0), :3] = 0
+            return img
         
-        draw = ImageDraw.Draw(img)
+        # PIL frames (pyautogui): Image.paste with a colour is a C-level fill
         for (x, y, w, h) in self.excluded_regions:
-            draw.rectangle([x, y, x + w, y + h], fill="black")
+            img.paste((0, 0, 0), (max(x, 0), max(y, 0), max(x + w + 1, 0), max(y + h + 1, 0)))
         
         return img
     
     def get_latest_frame(self) -> Optional[ScreenFrame]:
         """Get the most recent frame without blocking."""
-        frame = None
-        while not self.frame_queue.empty():
-            try:
-                frame = self.frame_queue.get_nowait()
-            except queue.Empty:
-                break
+        with self._frames_lock:
+            if not self._frames:
+                return None
+            frame = self._frames[-1]
+            self._frames.clear()
         return frame
     
-    def capture_frame(self) -> Optional[ScreenFrame]:
-        """Capture a single frame synchronously (for on-demand capture)."""
+    def _thread_sct(self):
+        """Return this thread's mss instance, opening it on first use."""
+        sct = getattr(self._tls, "sct", None)
+        if sct is None:
+            sct = self._tls.sct = mss.mss()
+        return sct
+    
+    def capture_frame(self, skip_unchanged: bool = False) -> Optional[ScreenFrame]:
+        """
+        Capture a single frame synchronously (for on-demand capture).
+        
+        Args:
+            skip_unchanged: Return None if the screen looks identical to the
+                last returned frame, so callers can skip OCR
+        """
         try:
             if CAPTURE_METHOD == "mss":
-                with mss.mss() as sct:
-                    monitor = sct.monitors[self.region.monitor]
-                    
-                    if self.region.width > 0 and self.region.height > 0:
-                        capture_area = {
-                            "left": self.region.x,
-                            "top": self.region.y,
-                            "width": self.region.width,
-                            "height": self.region.height
-                        }
-                    else:
-                        capture_area = monitor
-                    
-                    screenshot = sct.grab(capture_area)
-                    img = Image.frombytes(
-                        "RGB",
-                        (screenshot.width, screenshot.height),
-                        screenshot.rgb
-                    )
+                sct = self._thread_sct()
+                monitor = sct.monitors[self.region.monitor]
+                
+                if self.region.width > 0 and self.region.height > 0:
+                    capture_area = {
+                        "left": self.region.x,
+                        "top": self.region.y,
+                        "width": self.region.width,
+                        "height": self.region.height
+                    }
+                else:
+                    capture_area = monitor
+                
+                img = self._grab_bgra(sct, capture_area)
             else:
                 import pyautogui
                 if self.region.width > 0 and self.region.height > 0:
@@ -316,6 +382,9 @@ class ScreenCapture:
             # Apply privacy filters
             img = self._apply_privacy_filters(img)
             
+            if skip_unchanged and not self._is_changed(img):
+                return None
+            
             self.frame_counter += 1
             return ScreenFrame(
                 image=img,
@@ -328,11 +397,35 @@ class ScreenCapture:
             logger.error(f"Single capture error: {e}")
             return None
     
-    def get_frame_bytes(self, frame: ScreenFrame, format: str = "PNG") -> bytes:
-        """Convert frame to bytes for transmission."""
-        buffer = io.BytesIO()
-        frame.image.save(buffer, format=format)
+    def get_frame_bytes(self, frame: ScreenFrame, format: str = "JPEG", quality: int = 75) -> bytes:
+        """
+        Convert frame to bytes for transmission.
+        
+        Defaults to JPEG, which encodes far faster than PNG's Deflate; pass
+        format="PNG" when a lossless copy is needed.
+        """
+        if format.upper() in ("JPEG", "JPG"):
+            if cv2 is not None and isinstance(frame.image, np.ndarray):
+                # BGRA ndarray straight into libjpeg-turbo, no PIL conversion
+                ok, encoded = cv2.imencode(".jpg", frame.image[:, :, :3], [cv2.IMWRITE_JPEG_QUALITY, quality])
+                if ok:
+                    return encoded.tobytes()
+            buffer = self._send_buffer()
+            frame.to_pil().save(buffer, format="JPEG", quality=quality, optimize=False)
+            return buffer.getvalue()
+        
+        buffer = self._send_buffer()
+        frame.to_pil().save(buffer, format=format)
         return buffer.getvalue()
+    
+    def _send_buffer(self) -> io.BytesIO:
+        """This thread's reusable encode buffer, rewound and emptied."""
+        buffer = getattr(self._tls, "send_buf", None)
+        if buffer is None:
+            buffer = self._tls.send_buf = io.BytesIO()
+        buffer.seek(0)
+        buffer.truncate()
+        return buffer
 
 
 # Hotkey support for pause/resume
@@ -3,12 +3,118 @@ System Design Diagram Renderer
 Generates Mermaid diagrams from structured system design text
 """
 import re
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Characters not allowed in a Mermaid node ID
+_SANITIZE_RE = re.compile(r'[^a-zA-Z0-9]')
+
+# Words (group 1) and punctuation runs; punctuation breaks a phrase
+_TOKEN_RE = re.compile(r'(\w+)|[^\w\s]+')
+
+# "<source> <verb> <target>" verbs: verb -> (required preposition, arrow, group)
+_VERB_PHRASES: Dict[str, Tuple[Optional[str], str, int]] = {}
+for _group, _arrow, _phrases in (
+    (0, '-->', ('connect to', 'connects to', 'talk to', 'talks to', 'use', 'uses',
+                'call', 'calls', 'send to', 'sends to')),
+    (1, '-.->', ('read from', 'reads from', 'query', 'queries', 'fetch from', 'fetches from')),
+    (2, '-->', ('write to', 'writes to', 'store in', 'stores in', 'save to', 'saves to')),
+):
+    for _phrase in _phrases:
+        _verb, _, _prep = _phrase.partition(' ')
+        _VERB_PHRASES[_verb] = (_prep or None, _arrow, _group)
+
+
+# Component type keywords, in priority order (first category that matches wins)
+_COMPONENT_KEYWORDS = (
+    ('database', ('database', 'postgres', 'mysql', 'mongodb', 'db')),
+    ('cache', ('cache', 'redis', 'memcached')),
+    ('queue', ('queue', 'kafka', 'rabbitmq', 'sqs', 'pubsub')),
+    ('worker', ('worker', 'job', 'processor')),
+    ('service', ('service', 'api', 'server', 'microservice')),
+)
+
+
+@lru_cache(maxsize=4096)
+def _component_type(word: str) -> Optional[str]:
+    """Component type whose keyword occurs in word (substring match), memoized per word"""
+    for comp_type, keywords in _COMPONENT_KEYWORDS:
+        if any(kw in word for kw in keywords):
+            return comp_type
+    return None
+
+
+# Mermaid node definition per component type (cylinder, flag, or box)
+_DEFAULT_NODE_SHAPE = "  {id}[{name}]"
+_NODE_SHAPES = {
+    'database': "  {id}[({name})]",
+    'cache': "  {id}[({name})]",
+    'queue': "  {id}>{name}]",
+}
+
+# Left-to-right position of each component type in the default linear flow
+_TYPE_ORDER = {'client': 0, 'service': 1, 'queue': 2, 'worker': 3, 'cache': 4, 'database': 5}
+
+# Node styling appended to every generated flowchart
+_STYLE_LINES = (
+    "  classDef database fill:#f9f,stroke:#333,stroke-width:2px",
+    "  classDef cache fill:#ff9,stroke:#333,stroke-width:2px",
+    "  classDef queue fill:#9ff,stroke:#333,stroke-width:2px",
+)
+
+
+def _find_connections(text_lower: str) -> List[Tuple[str, str, str]]:
+    """
+    Find "<1-2 words> <verb phrase> <1-2 words>" connections in one token pass.
+    
+    Sources are leftmost, targets greedy (two words when available), and
+    matches within a verb group never overlap. Returns (source, target, arrow)
+    grouped by verb group, in text order within each group.
+    """
+    words = [m.group(1) for m in _TOKEN_RE.finditer(text_lower)]  # None = punctuation
+    n = len(words)
+    
+    def phrase_at(k: int) -> Optional[Tuple[int, str, int]]:
+        """(group, arrow, first target index) if a verb phrase + target start at k."""
+        if k >= n or words[k] is None:
+            return None
+        hit = _VERB_PHRASES.get(words[k])
+        if hit is None:
+            return None
+        prep, arrow, group = hit
+        k += 1
+        if prep is not None:
+            if k >= n or words[k] != prep:
+                return None
+            k += 1
+        if k >= n or words[k] is None:
+            return None
+        return group, arrow, k
+    
+    found: Tuple[List, List, List] = ([], [], [])
+    next_free = [0, 0, 0]  # Matches of one group never overlap
+    for j in range(n):
+        if words[j] is None:
+            continue
+        for src_len in (2, 1):  # Prefer a two-word source
+            if src_len == 2 and (j + 1 >= n or words[j + 1] is None):
+                continue
+            hit = phrase_at(j + src_len)
+            if hit is None:
+                continue
+            group, arrow, t = hit
+            if j < next_free[group]:
+                continue
+            end = t + 2 if t + 1 < n and words[t + 1] is not None else t + 1
+            found[group].append((' '.join(words[j:j + src_len]), ' '.join(words[t:end]), arrow))
+            next_free[group] = end
+    
+    return found[0] + found[1] + found[2]
+
 
 @dataclass
 class SystemComponent:
@@ -21,11 +127,9 @@ class SystemComponent:
 class DiagramRenderer:
     """
     Renders system design as Mermaid diagrams
-    """
     
-    def __init__(self):
-        self.components: Dict[str, SystemComponent] = {}
-        self.connections: List[tuple] = []
+    Stateless: one instance can be shared and used from several threads.
+    """
     
     def parse_design(self, design_text: str) -> str:
         """
@@ -40,14 +144,8 @@ class DiagramRenderer:
         """
         lines = design_text.lower().split('\n')
         
-        # Component type keywords
-        db_keywords = ['database', 'postgres', 'mysql', 'mongodb', 'db']
-        cache_keywords = ['cache', 'redis', 'memcached']
-        queue_keywords = ['queue', 'kafka', 'rabbitmq', 'sqs', 'pubsub']
-        service_keywords = ['service', 'api', 'server', 'microservice']
-        worker_keywords = ['worker', 'job', 'processor']
-        
-        components_found = set()
+        # Node ID -> (name, type); the first mention of an ID wins
+        components_found: Dict[str, Tuple[str, str]] = {}
         
         # Extract components
         for line in lines:
@@ -58,43 +156,17 @@ class DiagramRenderer:
             # Look for component mentions
             words = line.split()
             for i, word in enumerate(words):
-                word_clean = word.strip('.,;:')
-                
-                # Database
-                if any(kw in word_clean for kw in db_keywords):
-                    comp_name = self._extract_component_name(words, i, 'database')
-                    if comp_name:
-                        components_found.add((comp_name, 'database'))
-                
-                # Cache
-                elif any(kw in word_clean for kw in cache_keywords):
-                    comp_name = self._extract_component_name(words, i, 'cache')
-                    if comp_name:
-                        components_found.add((comp_name, 'cache'))
-                
-                # Queue
-                elif any(kw in word_clean for kw in queue_keywords):
-                    comp_name = self._extract_component_name(words, i, 'queue')
+                comp_type = _component_type(word.strip('.,;:'))
+                if comp_type:
+                    comp_name = self._extract_component_name(words, i, comp_type)
                     if comp_name:
-                        components_found.add((comp_name, 'queue'))
-                
-                # Worker
-                elif any(kw in word_clean for kw in worker_keywords):
-                    comp_name = self._extract_component_name(words, i, 'worker')
-                    if comp_name:
-                        components_found.add((comp_name, 'worker'))
-                
-                # Service/API
-                elif any(kw in word_clean for kw in service_keywords):
-                    comp_name = self._extract_component_name(words, i, 'service')
-                    if comp_name:
-                        components_found.add((comp_name, 'service'))
+                        components_found.setdefault(self._sanitize_id(comp_name), (comp_name, comp_type))
         
         # Always add client
-        components_found.add(('Client', 'client'))
+        components_found.setdefault('Client', ('Client', 'client'))
         
         # Build Mermaid diagram
-        return self._generate_mermaid(list(components_found), design_text)
+        return self._generate_mermaid(components_found, design_text)
     
     def _extract_component_name(self, words: List[str], index: int, comp_type: str) -> Optional[str]:
         """Extract component name from word list"""
@@ -118,96 +190,92 @@ class DiagramRenderer:
         
         return ' '.join(name_parts[:2]) if name_parts else None
     
-    def _generate_mermaid(self, components: List[tuple], full_text: str) -> str:
-        """Generate Mermaid flowchart"""
-        mermaid = ["flowchart LR\n"]
-        
+    def _generate_mermaid(self, components: Dict[str, Tuple[str, str]], full_text: str) -> str:
+        """Generate Mermaid flowchart from {node_id: (name, type)}"""
         # Define nodes with icons
         node_defs = {}
-        for name, comp_type in components:
-            node_id = self._sanitize_id(name)
-            
-            if comp_type == 'database':
-                node_defs[node_id] = f"  {node_id}[({name})]"
-            elif comp_type == 'cache':
-                node_defs[node_id] = f"  {node_id}[({name})]"
-            elif comp_type == 'queue':
-                node_defs[node_id] = f"  {node_id}>{name}]"
-            elif comp_type == 'worker':
-                node_defs[node_id] = f"  {node_id}[{name}]"
-            elif comp_type == 'service':
-                node_defs[node_id] = f"  {node_id}[{name}]"
-            elif comp_type == 'client':
-                node_defs[node_id] = f"  {node_id}[{name}]"
-            else:
-                node_defs[node_id] = f"  {node_id}[{name}]"
+        for node_id, (name, comp_type) in components.items():
+            shape = _NODE_SHAPES.get(comp_type, _DEFAULT_NODE_SHAPE)
+            node_defs[node_id] = shape.format(id=node_id, name=name)
         
         # Infer connections from text
         connections = []
         text_lower = full_text.lower()
         
-        comp_names = [name for name, _ in components]
+        # (name, lowercase name) computed once for all matches, plus an index
+        # from each lowercase name word to the positions of names containing it
+        comp_names_lower = [(name, name.lower()) for name, _ in components.values()]
+        token_index: Dict[str, List[int]] = {}
+        for pos, (_, name_lower) in enumerate(comp_names_lower):
+            for token in set(name_lower.split()):
+                token_index.setdefault(token, []).append(pos)
         
-        # Look for connection patterns
-        connection_patterns = [
-            (r'(\w+(?:\s+\w+)?)\s+(?:connects? to|talks? to|uses?|calls?|sends? to)\s+(\w+(?:\s+\w+)?)', '-->'),
-            (r'(\w+(?:\s+\w+)?)\s+(?:reads? from|queries?|fetches? from)\s+(\w+(?:\s+\w+)?)', '-.->'),
-            (r'(\w+(?:\s+\w+)?)\s+(?:writes? to|stores? in|saves? to)\s+(\w+(?:\s+\w+)?)', '-->'),
-        ]
-        
-        for pattern, arrow in connection_patterns:
-            matches = re.findall(pattern, text_lower)
-            for source, target in matches:
-                source = source.strip().title()
-                target = target.strip().title()
-                
-                # Check if these match any component names
-                source_match = self._find_matching_component(source, comp_names)
-                target_match = self._find_matching_component(target, comp_names)
-                
-                if source_match and target_match:
-                    connections.append((source_match, target_match, arrow))
+        # Look for connection phrases
+        for source, target, arrow in _find_connections(text_lower):
+            source = source.title()
+            target = target.title()
+            
+            # Check if these match any component names
+            source_match = self._find_matching_component(source, comp_names_lower, token_index)
+            target_match = self._find_matching_component(target, comp_names_lower, token_index)
+            
+            if source_match and target_match:
+                connections.append((source_match, target_match, arrow))
         
         # Default connections if none found
         if not connections and len(components) > 1:
             # Create linear flow
-            sorted_comps = sorted(components, key=lambda x: ('client', 'service', 'queue', 'worker', 'cache', 'database').index(x[1]) if x[1] in ('client', 'service', 'queue', 'worker', 'cache', 'database') else 99)
+            sorted_comps = sorted(components.values(), key=lambda x: _TYPE_ORDER.get(x[1], 99))
             for i in range(len(sorted_comps) - 1):
                 connections.append((sorted_comps[i][0], sorted_comps[i+1][0], '-->'))
         
-        # Build Mermaid
-        for node_id, node_def in node_defs.items():
-            mermaid.append(node_def)
-        
-        mermaid.append("\n")
-        
-        for source, target, arrow in connections:
-            source_id = self._sanitize_id(source)
-            target_id = self._sanitize_id(target)
-            if source_id in node_defs and target_id in node_defs:
-                mermaid.append(f"  {source_id} {arrow} {target_id}")
-        
-        # Add styling
-        mermaid.append("\n")
-        mermaid.append("  classDef database fill:#f9f,stroke:#333,stroke-width:2px")
-        mermaid.append("  classDef cache fill:#ff9,stroke:#333,stroke-width:2px")
-        mermaid.append("  classDef queue fill:#9ff,stroke:#333,stroke-width:2px")
+        # Build Mermaid: header, nodes, edges, styling
+        edge_ids = ((self._sanitize_id(s), self._sanitize_id(t), arrow) for s, t, arrow in connections)
+        edge_lines = [
+            f"  {source_id} {arrow} {target_id}"
+            for source_id, target_id, arrow in edge_ids
+            if source_id in node_defs and target_id in node_defs
+        ]
         
-        return '\n'.join(mermaid)
+        return '\n'.join(["flowchart LR\n", *node_defs.values(), "\n", *edge_lines, "\n", *_STYLE_LINES])
     
     def _sanitize_id(self, name: str) -> str:
         """Convert name to valid Mermaid ID"""
-        return re.sub(r'[^a-zA-Z0-9]', '', name)
+        return _SANITIZE_RE.sub('', name)
     
-    def _find_matching_component(self, text: str, components: List[str]) -> Optional[str]:
-        """Find component that matches text"""
+    def _find_matching_component(
+        self,
+        text: str,
+        components_lower: List[Tuple[str, str]],
+        token_index: Optional[Dict[str, List[int]]] = None
+    ) -> Optional[str]:
+        """
+        Find component that matches text (components given as (name, name.lower()))
+        
+        With a token_index (word -> positions in components_lower), components
+        sharing a word with text are checked first; the full scan only runs
+        when none of them matches.
+        """
         text_lower = text.lower()
-        for comp in components:
-            if text_lower in comp.lower() or comp.lower() in text_lower:
+        if token_index:
+            candidates = set()
+            for token in text_lower.split():
+                candidates.update(token_index.get(token, ()))
+            for pos in sorted(candidates):
+                comp, comp_lower = components_lower[pos]
+                if text_lower in comp_lower or comp_lower in text_lower:
+                    return comp
+        
+        for comp, comp_lower in components_lower:
+            if text_lower in comp_lower or comp_lower in text_lower:
                 return comp
         return None
 
 
+# Shared instance for render_system_design (the renderer holds no state)
+_RENDERER = DiagramRenderer()
+
+
 def render_system_design(design_text: str) -> str:
     """
     Render system design as Mermaid diagram
@@ -226,8 +294,7 @@ def render_system_design(design_text: str) -> str:
         mermaid = render_system_design(design)
         # Returns Mermaid flowchart syntax
     """
-    renderer = DiagramRenderer()
-    return renderer.parse_design(design_text)
+    return _RENDERER.parse_design(design_text)
 
 
 def generate_mermaid_from_components(
@@ -249,64 +316,39 @@ def generate_mermaid_from_components(
             workers=['Async Worker']
         )
     """
-    mermaid = ["flowchart LR\n"]
+    caches = caches or []
+    queues = queues or []
+    workers = workers or []
     
-    # Client
-    mermaid.append("  Client[Client]")
+    # Sanitize every name once
+    ids = {name: _SANITIZE_RE.sub('', name) for name in (*services, *databases, *caches, *queues, *workers)}
     
-    # Services
-    for svc in services:
-        svc_id = re.sub(r'[^a-zA-Z0-9]', '', svc)
-        mermaid.append(f"  {svc_id}[{svc}]")
+    node_lines = [
+        "  Client[Client]",
+        *(f"  {ids[svc]}[{svc}]" for svc in services),
+        *(f"  {ids[db]}[({db})]" for db in databases),
+        *(f"  {ids[cache]}[({cache})]" for cache in caches),
+        *(f"  {ids[queue]}>{queue}]" for queue in queues),
+        *(f"  {ids[worker]}[{worker}]" for worker in workers),
+    ]
     
-    # Databases
-    for db in databases:
-        db_id = re.sub(r'[^a-zA-Z0-9]', '', db)
-        mermaid.append(f"  {db_id}[({db})]")
-    
-    # Caches
+    # Every service connects to the first database and cache
+    svc_targets = []
+    if databases:
+        svc_targets.append(f" --> {ids[databases[0]]}")
     if caches:
-        for cache in caches:
-            cache_id = re.sub(r'[^a-zA-Z0-9]', '', cache)
-            mermaid.append(f"  {cache_id}[({cache})]")
-    
-    # Queues
-    if queues:
-        for queue in queues:
-            queue_id = re.sub(r'[^a-zA-Z0-9]', '', queue)
-            mermaid.append(f"  {queue_id}>{queue}]")
+        svc_targets.append(f" -.-> {ids[caches[0]]}")
     
-    # Workers
-    if workers:
-        for worker in workers:
-            worker_id = re.sub(r'[^a-zA-Z0-9]', '', worker)
-            mermaid.append(f"  {worker_id}[{worker}]")
+    edge_lines = [
+        "  Client --> " + ids[services[0]],
+        *(f"  {ids[svc]}{target}" for svc in services for target in svc_targets),
+    ]
     
-    # Connections
-    mermaid.append("\n")
-    mermaid.append("  Client --> " + re.sub(r'[^a-zA-Z0-9]', '', services[0]))
-    
-    for i, svc in enumerate(services):
-        svc_id = re.sub(r'[^a-zA-Z0-9]', '', svc)
-        
-        # Connect to databases
-        if databases:
-            db_id = re.sub(r'[^a-zA-Z0-9]', '', databases[0])
-            mermaid.append(f"  {svc_id} --> {db_id}")
-        
-        # Connect to caches
-        if caches:
-            cache_id = re.sub(r'[^a-zA-Z0-9]', '', caches[0])
-            mermaid.append(f"  {svc_id} -.-> {cache_id}")
-        
-        # Connect to queues
-        if queues and i == len(services) - 1:
-            queue_id = re.sub(r'[^a-zA-Z0-9]', '', queues[0])
-            mermaid.append(f"  {svc_id} --> {queue_id}")
-            
-            # Connect queue to workers
-            if workers:
-                worker_id = re.sub(r'[^a-zA-Z0-9]', '', workers[0])
-                mermaid.append(f"  {queue_id} --> {worker_id}")
+    # The last service feeds the queue, which feeds the workers
+    if queues:
+        queue_id = ids[queues[0]]
+        edge_lines.append(f"  {ids[services[-1]]} --> {queue_id}")
+        if workers:
+            edge_lines.append(f"  {queue_id} --> {ids[workers[0]]}")
     
-    return '\n'.join(mermaid)
+    return '\n'.join(["flowchart LR\n", *node_lines, "\n", *edge_lines])
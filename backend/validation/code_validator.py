@@ -5,9 +5,11 @@ Validates code correctness with sandbox execution
 import ast
 import re
 import subprocess
-import tempfile
 import os
 import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
@@ -15,6 +17,81 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+try:
+    import esprima
+except ImportError:
+    esprima = None
+
+# Function definitions (first capture group is the name)
+_PY_FUNC_RE = re.compile(r'def (\w+)\(')
+_JS_FUNC_RE = re.compile(r'function (\w+)\(')
+
+# Python data structures counted for the memory estimate: literals and
+# comprehensions, list()/dict()/set() calls, and typing List/Dict/Set hints
+_PY_STRUCT_NODES = (ast.List, ast.ListComp, ast.Dict, ast.DictComp, ast.Set, ast.SetComp)
+_PY_STRUCT_CALLS = frozenset(("list", "dict", "set"))
+_PY_STRUCT_HINTS = frozenset(("List", "Dict", "Set"))
+
+
+def _compact_json(obj) -> str:
+    """Minimal JSON for the sandbox pipes/harness: no spaces, UTF-8 kept unescaped"""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+# Persistent Python sandbox: first stdin line is {"code", "func"}, then one
+# {"input", "expected"} per line, each answered with one JSON line on stdout.
+# The solution is compiled once and executed into a fresh namespace per test,
+# so its module-level state does not leak between test cases.
+# User prints are redirected to stderr so they cannot corrupt the results.
+_PY_WORKER = '''
+import json
+import sys
+import time
+
+sys.stdin.reconfigure(encoding="utf-8")
+sys.stdout.reconfigure(encoding="utf-8")
+sys.stderr.reconfigure(errors="replace")
+_out = sys.stdout
+sys.stdout = sys.stderr
+
+_setup = json.loads(sys.stdin.readline())
+_setup_error = None
+try:
+    _solution = compile(_setup["code"], "<solution>", "exec")
+except BaseException as e:
+    _setup_error = str(e)
+
+for _line in sys.stdin:
+    _test = json.loads(_line)
+    test_input = _test["input"]
+    expected = _test["expected"]
+    try:
+        if _setup_error is not None:
+            raise RuntimeError(_setup_error)
+        _ns = {"__name__": "__main__"}
+        try:
+            exec(_solution, _ns)
+        except (SystemExit, KeyboardInterrupt) as e:
+            raise RuntimeError(str(e))  # Report it as a test error; keep the worker alive
+        func = _ns.get(_setup["func"])
+        if func is None:
+            raise NameError("name %r is not defined" % _setup["func"])
+        start = time.time()
+        if isinstance(test_input, dict):
+            result = func(**test_input)
+        elif isinstance(test_input, list):
+            result = func(*test_input)
+        else:
+            result = func(test_input)
+        elapsed = time.time() - start
+        
+        line = json.dumps({"passed": result == expected, "actual": result, "time": elapsed}, ensure_ascii=False, separators=(",", ":"))
+    except Exception as e:
+        line = json.dumps({"passed": False, "error": str(e), "time": 0}, ensure_ascii=False, separators=(",", ":"))
+    _out.write(line + "\\n")
+    _out.flush()
+'''
+
 
 @dataclass
 class ValidationResult:
@@ -38,6 +115,7 @@ class CodeValidator:
     def __init__(self, language: str = "python"):
         self.language = language.lower()
         self.max_execution_time = 5  # seconds
+        self.max_workers = min(8, os.cpu_count() or 1)  # Parallel test sandboxes
         
     def validate(self, code: str, test_cases: List[Dict]) -> ValidationResult:
         """
@@ -51,7 +129,7 @@ class CodeValidator:
             ValidationResult with all checks
         """
         # Static checks
-        syntax_valid, syntax_error = self._check_syntax(code)
+        syntax_valid, syntax_error, tree = self._check_syntax(code)
         if not syntax_valid:
             return ValidationResult(
                 passed=False,
@@ -63,7 +141,7 @@ class CodeValidator:
                 error_message=syntax_error
             )
         
-        complexity_warnings = self._check_complexity(code)
+        complexity_warnings, structures = self._check_complexity(tree)
         
         # Runtime tests
         if self.language == "python":
@@ -102,16 +180,25 @@ class CodeValidator:
             syntax_valid=True,
             complexity_warnings=complexity_warnings,
             execution_time=exec_time,
-            memory_estimate=self._estimate_memory(code),
+            memory_estimate=self._estimate_memory(code, structures),
             counterexamples=counterexamples if counterexamples else None
         )
     
-    def _check_syntax(self, code: str) -> Tuple[bool, Optional[str]]:
-        """Check syntax validity"""
+    def _check_syntax(self, code: str) -> Tuple[bool, Optional[str], Optional[ast.AST]]:
+        """Check syntax validity; returns (valid, error, Python AST or None)"""
         try:
             if self.language == "python":
-                ast.parse(code)
+                return True, None, ast.parse(code)
             elif self.language == "javascript":
+                # Parse in-process first; esprima lags newer syntax, so only
+                # its rejections are confirmed with Node
+                if esprima is not None:
+                    try:
+                        esprima.parseScript(code)
+                        return True, None, None
+                    except esprima.Error:
+                        pass
+                
                 # Basic check - try to run through Node
                 result = subprocess.run(
                     ["node", "--check"],
@@ -121,101 +208,115 @@ class CodeValidator:
                     timeout=2
                 )
                 if result.returncode != 0:
-                    return False, result.stderr
+                    return False, result.stderr, None
             # For Java, compile check happens in runtime
-            return True, None
+            return True, None, None
         except SyntaxError as e:
-            return False, str(e)
+            return False, str(e), None
         except Exception as e:
-            return False, str(e)
+            return False, str(e), None
     
-    def _check_complexity(self, code: str) -> List[str]:
-        """Detect complexity issues"""
+    def _check_complexity(self, tree: Optional[ast.AST]) -> Tuple[List[str], Optional[int]]:
+        """
+        Detect complexity issues (Python only, one walk over the parsed AST)
+        
+        Returns (warnings, data structure count for _estimate_memory); the
+        count is None when there is no AST to walk.
+        """
         warnings = []
+        structures = None
         
-        if self.language == "python":
+        if self.language == "python" and tree is not None:
+            loops = returns = appends = structures = 0
+            sorts = False
+            funcs = []
+            calls: Dict[str, int] = {}
+            
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.For, ast.AsyncFor, ast.While, ast.comprehension)):
+                    loops += 1
+                elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    funcs.append(node)
+                elif isinstance(node, ast.Return):
+                    returns += 1
+                elif isinstance(node, _PY_STRUCT_NODES):
+                    structures += 1
+                elif isinstance(node, ast.Name) and node.id in _PY_STRUCT_HINTS:
+                    structures += 1
+                elif isinstance(node, ast.Call):
+                    # Name for f(...), attribute for obj.f(...)
+                    func = node.func
+                    name = func.id if isinstance(func, ast.Name) else getattr(func, "attr", None)
+                    if name is not None:
+                        calls[name] = calls.get(name, 0) + 1
+                        if name == "append" and isinstance(func, ast.Attribute):
+                            appends += 1
+                        elif name == "sorted" or (name == "sort" and isinstance(func, ast.Attribute)):
+                            sorts = True
+                        elif name in _PY_STRUCT_CALLS and isinstance(func, ast.Name):
+                            structures += 1
+            
             # Detect nested loops (potential O(n²) or worse)
-            nested_loops = code.count("for ") + code.count("while ")
-            if nested_loops >= 3:
+            if loops >= 3:
                 warnings.append("⚠ Multiple nested loops detected - consider O(n²) or O(n³) complexity")
             
             # Detect recursive calls
-            if "def " in code and code.count("return") > 1:
-                func_names = re.findall(r'def (\w+)\(', code)
-                for func in func_names:
-                    if code.count(f"{func}(") > 1:
-                        warnings.append(f"⚠ Recursive function '{func}' detected - ensure base case exists")
+            if funcs and returns > 1:
+                for func in sorted(funcs, key=lambda f: (f.lineno, f.col_offset)):
+                    if calls.get(func.name, 0) >= 1:
+                        warnings.append(f"⚠ Recursive function '{func.name}' detected - ensure base case exists")
             
             # Detect common inefficiencies
-            if ".append(" in code and "for " in code:
+            if appends and loops:
                 warnings.append("💡 List append in loop - consider list comprehension")
             
-            if "sorted(" in code or ".sort(" in code:
+            if sorts:
                 warnings.append("💡 Sort detected - time complexity at least O(n log n)")
         
-        return warnings
+        return warnings, structures
     
     def _run_python_tests(self, code: str, test_cases: List[Dict]) -> Tuple[List[Dict], float]:
-        """Run Python code in sandbox with test cases"""
+        """Run Python test cases, split across up to max_workers persistent interpreters"""
+        # Extract function name
+        func_match = _PY_FUNC_RE.search(code)
+        func_name = func_match.group(1) if func_match else "solution"
+        
+        indexed = list(enumerate(test_cases))
+        n_shards = max(1, min(len(indexed), self.max_workers))
+        if n_shards == 1:
+            return self._run_python_shard(code, func_name, indexed)
+        
+        # Contiguous shards keep results in test order when concatenated
+        size = -(-len(indexed) // n_shards)
+        shards = [indexed[k:k + size] for k in range(0, len(indexed), size)]
+        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+            outcomes = list(pool.map(lambda shard: self._run_python_shard(code, func_name, shard), shards))
+        
+        results = [r for shard_results, _ in outcomes for r in shard_results]
+        return results, sum(t for _, t in outcomes)
+    
+    def _run_python_shard(self, code: str, func_name: str, shard: List[Tuple[int, Dict]]) -> Tuple[List[Dict], float]:
+        """Run (index, test) pairs through one persistent sandbox interpreter"""
         results = []
         total_time = 0
         
-        for i, test in enumerate(test_cases):
-            try:
-                # Create sandbox environment
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                    # Extract function name
-                    func_match = re.search(r'def (\w+)\(', code)
-                    func_name = func_match.group(1) if func_match else "solution"
-                    
-                    # Write test harness
-                    test_code = f"""
-import time
-import json
-import sys
-
-{code}
-
-# Test case
-test_input = {json.dumps(test['input'])}
-expected = {json.dumps(test['expected'])}
-
-try:
-    start = time.time()
-    if isinstance(test_input, dict):
-        result = {func_name}(**test_input)
-    elif isinstance(test_input, list):
-        result = {func_name}(*test_input)
-    else:
-        result = {func_name}(test_input)
-    elapsed = time.time() - start
-    
-    passed = result == expected
-    print(json.dumps({{
-        "passed": passed,
-        "actual": result,
-        "time": elapsed
-    }}))
-except Exception as e:
-    print(json.dumps({{
-        "passed": False,
-        "error": str(e),
-        "time": 0
-    }}))
-"""
-                    f.write(test_code)
-                    f.flush()
+        worker = None
+        try:
+            for i, test in shard:
+                try:
+                    # (Re)start the worker; after a timeout or crash it is replaced
+                    if worker is None:
+                        worker = self._start_python_worker(code, func_name)
+                    proc, lines = worker
                     
-                    # Run in subprocess (sandboxed)
-                    result = subprocess.run(
-                        ["python", f.name],
-                        capture_output=True,
-                        text=True,
-                        timeout=self.max_execution_time
-                    )
+                    proc.stdin.write(_compact_json({"input": test["input"], "expected": test["expected"]}) + "\n")
+                    proc.stdin.flush()
+                    line = lines.get(timeout=self.max_execution_time)
+                    if line is None:
+                        raise RuntimeError(f"Python worker exited (code {proc.wait()})")
                     
                     # Parse result
-                    output = json.loads(result.stdout.strip())
+                    output = json.loads(line)
                     results.append({
                         "test_num": i + 1,
                         "passed": output["passed"],
@@ -226,48 +327,95 @@ except Exception as e:
                     })
                     total_time += output.get("time", 0)
                     
-            except subprocess.TimeoutExpired:
-                results.append({
-                    "test_num": i + 1,
-                    "passed": False,
-                    "input": test["input"],
-                    "expected": test["expected"],
-                    "error": f"Timeout: exceeded {self.max_execution_time}s"
-                })
-            except Exception as e:
-                results.append({
-                    "test_num": i + 1,
-                    "passed": False,
-                    "input": test["input"],
-                    "expected": test["expected"],
-                    "error": str(e)
-                })
-            finally:
-                # Cleanup
-                try:
-                    os.unlink(f.name)
-                except:
-                    pass
+                except queue.Empty:
+                    self._stop_worker(worker, kill=True)
+                    worker = None
+                    results.append({
+                        "test_num": i + 1,
+                        "passed": False,
+                        "input": test["input"],
+                        "expected": test["expected"],
+                        "error": f"Timeout: exceeded {self.max_execution_time}s"
+                    })
+                except Exception as e:
+                    self._stop_worker(worker, kill=True)
+                    worker = None
+                    results.append({
+                        "test_num": i + 1,
+                        "passed": False,
+                        "input": test["input"],
+                        "expected": test["expected"],
+                        "error": str(e)
+                    })
+        finally:
+            self._stop_worker(worker)
         
         return results, total_time
     
+    def _start_python_worker(self, code: str, func_name: str) -> Tuple[subprocess.Popen, "queue.Queue"]:
+        """
+        Spawn a sandbox interpreter that defines the solution once and then
+        answers one JSON test per stdin line; stdout lines go to the returned queue
+        (None on EOF) so reads can time out.
+        """
+        proc = subprocess.Popen(
+            ["python", "-u", "-c", _PY_WORKER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8"
+        )
+        lines: queue.Queue = queue.Queue()
+        
+        def pump():
+            for line in proc.stdout:
+                lines.put(line)
+            lines.put(None)
+        
+        threading.Thread(target=pump, daemon=True).start()
+        proc.stdin.write(_compact_json({"code": code, "func": func_name}) + "\n")
+        proc.stdin.flush()
+        return proc, lines
+    
+    @staticmethod
+    def _stop_worker(worker: Optional[Tuple[subprocess.Popen, "queue.Queue"]], kill: bool = False):
+        """Close a sandbox worker; kill it outright if it is stuck or broken"""
+        if worker is None:
+            return
+        proc, _ = worker
+        try:
+            if not kill:
+                proc.stdin.close()
+                proc.wait(timeout=1)
+                return
+        except Exception:
+            pass
+        proc.kill()
+        proc.wait()
+    
     def _run_js_tests(self, code: str, test_cases: List[Dict]) -> Tuple[List[Dict], float]:
-        """Run JavaScript code with Node.js"""
-        results = []
-        total_time = 0
+        """Run JavaScript code with Node.js, test cases in parallel"""
+        # Extract function name
+        func_match = _JS_FUNC_RE.search(code)
+        func_name = func_match.group(1) if func_match else "solution"
         
-        for i, test in enumerate(test_cases):
-            try:
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.js', delete=False) as f:
-                    # Extract function name
-                    func_match = re.search(r'function (\w+)\(', code)
-                    func_name = func_match.group(1) if func_match else "solution"
-                    
-                    test_code = f"""
+        workers = max(1, min(len(test_cases), self.max_workers))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(
+                lambda item: self._run_one_js_test(code, func_name, item[1], item[0]),
+                enumerate(test_cases)
+            ))
+        
+        return [r for r, _ in outcomes], sum(t for _, t in outcomes)
+    
+    def _run_one_js_test(self, code: str, func_name: str, test: Dict, i: int) -> Tuple[Dict, float]:
+        """Run a single JavaScript test case; returns (result, elapsed)"""
+        test_code = f"""
 {code}
 
-const testInput = {json.dumps(test['input'])};
-const expected = {json.dumps(test['expected'])};
+const testInput = {_compact_json(test['input'])};
+const expected = {_compact_json(test['expected'])};
 
 try {{
     const start = Date.now();
@@ -288,42 +436,35 @@ try {{
     }}));
 }}
 """
-                    f.write(test_code)
-                    f.flush()
-                    
-                    result = subprocess.run(
-                        ["node", f.name],
-                        capture_output=True,
-                        text=True,
-                        timeout=self.max_execution_time
-                    )
-                    
-                    output = json.loads(result.stdout.strip())
-                    results.append({
-                        "test_num": i + 1,
-                        "passed": output["passed"],
-                        "input": test["input"],
-                        "expected": test["expected"],
-                        "actual": output.get("actual"),
-                        "error": output.get("error")
-                    })
-                    total_time += output.get("time", 0)
-                    
-            except Exception as e:
-                results.append({
-                    "test_num": i + 1,
-                    "passed": False,
-                    "input": test["input"],
-                    "expected": test["expected"],
-                    "error": str(e)
-                })
-            finally:
-                try:
-                    os.unlink(f.name)
-                except:
-                    pass
-        
-        return results, total_time
+        try:
+            # Script goes to Node on stdin, no temp file
+            result = subprocess.run(
+                ["node", "-"],
+                input=test_code,
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                timeout=self.max_execution_time
+            )
+            
+            output = json.loads(result.stdout.strip())
+            return {
+                "test_num": i + 1,
+                "passed": output["passed"],
+                "input": test["input"],
+                "expected": test["expected"],
+                "actual": output.get("actual"),
+                "error": output.get("error")
+            }, output.get("time", 0)
+            
+        except Exception as e:
+            return {
+                "test_num": i + 1,
+                "passed": False,
+                "input": test["input"],
+                "expected": test["expected"],
+                "error": str(e)
+            }, 0
     
     def _run_java_tests(self, code: str, test_cases: List[Dict]) -> Tuple[List[Dict], float]:
         """Run Java code with compilation + execution"""
@@ -339,16 +480,18 @@ try {{
             })
         return results, 0
     
-    def _estimate_memory(self, code: str) -> str:
-        """Rough memory estimation"""
+    def _estimate_memory(self, code: str, structures: Optional[int] = None) -> str:
+        """Rough memory estimation (structures: count from _check_complexity, if any)"""
         # Count data structures
-        lists = code.count("[") + code.count("list(") + code.count("List")
-        dicts = code.count("{") + code.count("dict(") + code.count("Dict")
-        sets = code.count("set(") + code.count("Set")
+        if structures is None:
+            lists = code.count("[") + code.count("list(") + code.count("List")
+            dicts = code.count("{") + code.count("dict(") + code.count("Dict")
+            sets = code.count("set(") + code.count("Set")
+            structures = lists + dicts + sets
         
-        if lists + dicts + sets > 5:
+        if structures > 5:
             return "High (multiple data structures)"
-        elif lists + dicts + sets > 2:
+        elif structures > 2:
             return "Medium (few data structures)"
         else:
             return "Low (minimal storage)"
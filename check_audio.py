@@ -2,19 +2,22 @@
 Check available audio devices
 Run this to find your microphone/system audio device index
 """
-import sounddevice as sd
 
 def check_devices():
+    # Imported here so importing this module doesn't initialise PortAudio
+    import sounddevice as sd
+    
     print("\n" + "="*60)
     print("AVAILABLE AUDIO DEVICES")
     print("="*60)
     
     devices = sd.query_devices()
+    default_name = sd.query_devices(sd.default.device[0])['name']
     
     print("\n📥 INPUT DEVICES (for listening to audio):\n")
     for i, device in enumerate(devices):
         if device.get('max_input_channels', 0) > 0:
-            default = " ← DEFAULT" if device.get('name') == sd.query_devices(sd.default.device[0])['name'] else ""
+            default = " ← DEFAULT" if device.get('name') == default_name else ""
             print(f"  [{i}] {device['name']}{default}")
     
     print("\n" + "-"*60)
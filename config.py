@@ -2,6 +2,7 @@
 Configuration for Interview Assistant
 """
 import os
+from types import MappingProxyType
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,22 +18,29 @@ AUDIO_DEVICE_INDEX = 1  # Microphone Array - Intel Smart Sound
 SAMPLE_RATE = 16000
 CHUNK_DURATION = 3  # seconds per transcription chunk (reduced for faster response)
 
+# API Server Settings
+API_HOST = "0.0.0.0"
+API_PORT = 8000
+# Uvicorn worker processes. Session state is per worker (shared-nothing), so
+# more than 1 requires session-affine routing in front of the server.
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+
 # Interview Settings
 DEFAULT_ROLE = "SDE"
 DIFFICULTY = "medium"  # easy, medium, hard
 MAX_FOLLOWUPS = 3  # Max follow-up questions per answer
 INTERVIEW_TIME_LIMIT = 45  # minutes
 
-# Scoring Weights (must sum to 1.0)
-SCORING_WEIGHTS = {
+# Scoring Weights (must sum to 1.0); read-only so it can be shared without copying
+SCORING_WEIGHTS = MappingProxyType({
     "star_structure": 0.25,
     "technical_accuracy": 0.30,
     "communication": 0.20,
     "problem_solving": 0.25,
-}
+})
 
 # Role Templates
-ROLE_TEMPLATES = {
+_ROLE_TEMPLATES = {
     "SDE": {
         "name": "Software Development Engineer",
         "behavioral_weight": 0.4,
@@ -71,6 +79,12 @@ ROLE_TEMPLATES = {
     },
 }
 
+# Read-only views (topics as tuples) so consumers can share them without deepcopy
+ROLE_TEMPLATES = MappingProxyType({
+    role: MappingProxyType({**template, "topics": tuple(template["topics"])})
+    for role, template in _ROLE_TEMPLATES.items()
+})
+
 # UI Settings
 WINDOW_WIDTH = 500
 WINDOW_HEIGHT = 400
@@ -4,10 +4,21 @@ Audio Listener - Real-time speech transcription
 import logging
 import threading
 import queue
+from collections import deque
 import numpy as np
 import sounddevice as sd
 import speech_recognition as sr
-from typing import Callable, Optional
+from typing import Callable, List, Optional
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
 
 from config import AUDIO_DEVICE_INDEX, SAMPLE_RATE, CHUNK_DURATION
 
@@ -17,9 +28,19 @@ logger = logging.getLogger(__name__)
 class AudioListener:
     """
     Real-time audio listener with speech-to-text transcription.
-    Listens to system audio (meeting) and transcribes in chunks.
+    Listens to system audio (meeting) and transcribes each utterance with a
+    local Whisper model, or fixed chunks with Google Speech when
+    faster-whisper is not installed.
     """
     
+    # Local transcription settings (WebRTC VAD accepts 10/20/30 ms frames)
+    WHISPER_MODEL = "small.en"
+    VAD_FRAME_MS = 20
+    VAD_AGGRESSIVENESS = 2
+    PREROLL_FRAMES = 10  # Speech onset kept before the first voiced frame
+    END_SILENCE_FRAMES = 25  # 500 ms of silence ends an utterance
+    MAX_UTTERANCE_SECONDS = 15
+    
     def __init__(self, device_index: int = AUDIO_DEVICE_INDEX):
         """
         Initialize audio listener.
@@ -32,6 +53,7 @@ class AudioListener:
         self.chunk_duration = CHUNK_DURATION
         
         self.recognizer = sr.Recognizer()
+        self.model = self._load_whisper_model()
         self.audio_queue = queue.Queue()
         
         self.running = False
@@ -71,40 +93,129 @@ class AudioListener:
             self.process_thread.join(timeout=2)
         logger.info("Audio listener stopped")
     
+    def _load_whisper_model(self):
+        """Local Whisper model (int8 on CPU, int8/float16 on CUDA), or None for Google Speech"""
+        if WhisperModel is None:
+            logger.info("faster-whisper not installed; using Google Speech")
+            return None
+        try:
+            import ctranslate2
+            if ctranslate2.get_cuda_device_count() > 0:
+                device, compute_type = "cuda", "int8_float16"
+            else:
+                device, compute_type = "cpu", "int8"
+            model = WhisperModel(self.WHISPER_MODEL, device=device, compute_type=compute_type)
+            logger.info(f"Local Whisper model {self.WHISPER_MODEL} loaded ({device}, {compute_type})")
+            return model
+        except Exception as e:
+            logger.warning(f"Could not load Whisper model, using Google Speech: {e}")
+            return None
+    
     def _listen_loop(self):
         """Continuously capture audio chunks."""
-        chunk_samples = int(self.sample_rate * self.chunk_duration)
+        if self.model is not None:
+            # Short blocks of whole VAD frames so utterances end promptly
+            chunk_samples = self.sample_rate * self.VAD_FRAME_MS // 1000 * 5
+        else:
+            chunk_samples = int(self.sample_rate * self.chunk_duration)
         
         try:
             with sd.InputStream(
                 device=self.device_index,
                 channels=1,
                 samplerate=self.sample_rate,
-                dtype=np.float32,
+                dtype=np.int16,  # PortAudio converts; no float temp + astype
             ) as stream:
                 while self.running:
                     audio_data, _ = stream.read(chunk_samples)
                     
-                    # Convert to int16 for speech recognition
-                    audio_int16 = (audio_data * 32767).astype(np.int16)
-                    
-                    # Queue the audio chunk
-                    self.audio_queue.put(audio_int16.tobytes())
+                    # Queue the int16 samples as-is
+                    self.audio_queue.put(audio_data)
                     
         except Exception as e:
             logger.error(f"Audio capture error: {e}")
             self.running = False
     
     def _process_loop(self):
-        """Process audio chunks and transcribe."""
+        """Cut utterances at VAD silence and transcribe each one locally."""
+        if self.model is None:
+            self._process_loop_google()
+            return
+        
+        frame_samples = self.sample_rate * self.VAD_FRAME_MS // 1000
+        max_frames = self.MAX_UTTERANCE_SECONDS * 1000 // self.VAD_FRAME_MS
+        if webrtcvad is not None:
+            vad = webrtcvad.Vad(self.VAD_AGGRESSIVENESS)
+        else:
+            # Without VAD every frame counts as speech: fixed-length chunks
+            vad = None
+            max_frames = int(self.chunk_duration * 1000) // self.VAD_FRAME_MS
+        
+        preroll = deque(maxlen=self.PREROLL_FRAMES)
+        utterance: List[np.ndarray] = []
+        silent_frames = 0
+        
+        while self.running:
+            try:
+                samples = self.audio_queue.get(timeout=1).reshape(-1)
+            except queue.Empty:
+                continue
+            
+            for start in range(0, len(samples) - frame_samples + 1, frame_samples):
+                frame = samples[start:start + frame_samples]
+                speech = vad is None or vad.is_speech(frame.tobytes(), self.sample_rate)
+                
+                if utterance:
+                    utterance.append(frame)
+                    silent_frames = 0 if speech else silent_frames + 1
+                    if silent_frames >= self.END_SILENCE_FRAMES or len(utterance) >= max_frames:
+                        self._transcribe_local(utterance)
+                        utterance = []
+                        silent_frames = 0
+                elif speech:
+                    utterance.extend(preroll)
+                    utterance.append(frame)
+                    preroll.clear()
+                else:
+                    preroll.append(frame)
+        
+        # Flush speech still buffered at stop
+        if utterance:
+            self._transcribe_local(utterance)
+    
+    def _transcribe_local(self, frames: List[np.ndarray]):
+        """Transcribe one utterance (int16 frames) with the local Whisper model."""
+        audio = np.concatenate(frames).astype(np.float32)
+        audio *= 1.0 / 32768.0
+        try:
+            segments, _ = self.model.transcribe(audio, beam_size=1, vad_filter=False, language="en")
+            text = " ".join(segment.text.strip() for segment in segments).strip()
+        except Exception as e:
+            logger.error(f"Local transcription error: {e}")
+            return
+        
+        if text:
+            self._emit_transcript(text)
+        else:
+            logger.debug("No speech detected in utterance")
+    
+    def _emit_transcript(self, text: str):
+        """Append text to the transcript and notify the callback."""
+        self.full_transcript += " " + text
+        if self.on_transcript:
+            self.on_transcript(text)
+        logger.info(f"✓ Transcribed: {text}")
+    
+    def _process_loop_google(self):
+        """Process fixed-length audio chunks with Google Speech."""
         while self.running:
             try:
                 # Get audio chunk (with timeout)
-                audio_bytes = self.audio_queue.get(timeout=1)
+                audio_chunk = self.audio_queue.get(timeout=1)
                 
-                # Create AudioData for recognition
+                # Create AudioData for recognition (single bytes copy)
                 audio_data = sr.AudioData(
-                    audio_bytes,
+                    audio_chunk.tobytes(),
                     self.sample_rate,
                     2  # 2 bytes per sample (int16)
                 )
@@ -113,10 +224,7 @@ class AudioListener:
                 try:
                     text = self.recognizer.recognize_google(audio_data)
                     if text and text.strip():
-                        self.full_transcript += " " + text
-                        if self.on_transcript:
-                            self.on_transcript(text)
-                        logger.info(f"✓ Transcribed: {text}")
+                        self._emit_transcript(text)
                 except sr.UnknownValueError:
                     logger.debug("No speech detected in chunk")
                     pass  # No speech detected
@@ -188,7 +188,7 @@ class InterviewAssistant:
         
         try:
             # Capture screen
-            frame = self.screen_capture.capture_frame()
+            frame = self.screen_capture.capture_frame(skip_unchanged=True)
             if frame is None:
                 return
             
@@ -118,6 +118,11 @@ class ParakeetInterviewAssistant:
         self.cooldown_timer.timeout.connect(self.decision_engine.check_cooldown_timeout)
         self.cooldown_timer.start(500)
         
+        # Batched decision gate over queued transcript events
+        self.decision_timer = QTimer()
+        self.decision_timer.timeout.connect(self._process_pending_events)
+        self.decision_timer.start(100)
+        
         self.overlay.show_message("▶ Parakeet system active\n\nListening for questions...")
         logger.info("Parakeet system started")
     
@@ -145,12 +150,16 @@ class ParakeetInterviewAssistant:
         # Display in UI
         self.overlay.add_transcript_line(event.speaker.name, event.text)
         
-        # Update decision engine state
-        if event.speaker == Speaker.INTERVIEWER:
-            self.decision_engine.on_interviewer_spoke()
+        # Queue for the batched decision gate (see _process_pending_events)
+        self.decision_engine.enqueue(event)
+    
+    def _process_pending_events(self):
+        """Run the decision gate once over all transcript events queued since the last tick"""
+        if self.is_paused:
+            return
         
-        # Decision Gate: Should we generate an answer?
-        if self.decision_engine.should_generate_answer(event):
+        event = self.decision_engine.drain_pending()
+        if event:
             self._generate_answer(event)
     
     def _generate_answer(self, event: TranscriptEvent):
@@ -216,7 +225,7 @@ class ParakeetInterviewAssistant:
             return
         
         try:
-            frame = self.screen_capture.capture_frame()
+            frame = self.screen_capture.capture_frame(skip_unchanged=True)
             if frame is None:
                 return
             
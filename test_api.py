@@ -4,6 +4,8 @@ Quick test of all FastAPI endpoints
 """
 import requests
 import json
+import threading
+import time
 
 BASE_URL = "http://localhost:8000"
 
@@ -99,8 +101,46 @@ print(f"Score: {evaluation['score']}/100")
 print(f"Proficiency Level: {evaluation['proficiency_level']}")
 print(f"Strengths: {len(evaluation['strengths'])} identified")
 
+# Stream answer (other requests must not wait for the stream)
+print("\n7. Stream Answer")
+first_chunk = threading.Event()
+stream_chunks = []
+stream_end = []
+
+def read_stream():
+    with requests.post(f"{BASE_URL}/answer/stream", json={
+        "session_id": session_id,
+        "question": "Explain how a hash map handles collisions"
+    }, stream=True) as stream:
+        for line in stream.iter_lines():
+            if line:
+                stream_chunks.append(json.loads(line))
+                first_chunk.set()
+    stream_end.append(time.perf_counter())
+    first_chunk.set()
+
+stream_thread = threading.Thread(target=read_stream)
+stream_thread.start()
+first_chunk.wait(timeout=30)
+
+health_start = time.perf_counter()
+response = requests.get(f"{BASE_URL}/health")
+health_end = time.perf_counter()
+health_time = health_end - health_start
+print(f"Health during stream: {response.status_code} in {health_time * 1000:.0f} ms")
+stream_thread.join(timeout=120)
+
+print(f"Stream chunks: {len(stream_chunks)}, done: {stream_chunks[-1].get('done', False) if stream_chunks else False}")
+assert response.status_code == 200
+if stream_end and health_end < stream_end[0]:
+    # Stream still in flight: a free event loop answers /health promptly
+    assert health_time < 1.0, "health check waited for the answer stream"
+    print("Health check served while stream in flight")
+else:
+    print("Stream finished before health check returned (inconclusive)")
+
 # Get session report
-print("\n7. Get Session Report")
+print("\n8. Get Session Report")
 response = requests.get(f"{BASE_URL}/session/report/{session_id}")
 print(f"Status: {response.status_code}")
 report = response.json()